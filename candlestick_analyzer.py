@@ -23,9 +23,236 @@ candlestick_analyzer.py
 
 import MetaTrader5 as mt5
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Final, Iterator, NamedTuple
+from collections.abc import Mapping
+from functools import lru_cache
 import time
+import math
+import logging
 import statistics
+from bisect import bisect_right
+from collections import deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ข้อความ diagnostic ของ hot path - ไม่ format string เลยถ้าไม่ได้เปิด DEBUG
+logger = logging.getLogger(__name__)
+
+# จำนวนทศนิยมของ fields ที่ปัดเฉพาะตอนส่งออก (คำนวณภายในใช้ค่าเต็ม)
+_API_ROUNDING = {
+    'volume_factor': 2,
+    'avg_volume': 0,
+    'volatility_ratio': 2,
+    'analysis_quality': 3
+}
+
+
+def _format_for_api(analysis: 'CandleAnalysis') -> 'CandleAnalysis':
+    """🔢 ปัดทศนิยมตาม _API_ROUNDING ครั้งเดียวที่ขอบ API"""
+    for key, digits in _API_ROUNDING.items():
+        value = getattr(analysis, key, None)
+        if isinstance(value, float):
+            setattr(analysis, key, round(value, digits))
+    return analysis
+
+
+class CandleAnalysis(Mapping):
+    """
+    🕯️ ผลวิเคราะห์แท่งเทียน - เก็บใน __slots__ แทน dict
+    
+    ภายใน analyzer เขียนผ่าน attribute ตรงๆ ระหว่างสร้าง แล้วเรียก _freeze()
+    ก่อนเก็บ cache - หลังจากนั้นแก้ไขไม่ได้ทั้ง attribute และ mapping
+    ผู้ใช้ภายนอกอ่านได้ทั้ง attribute และแบบ mapping เดิม (.get(), [key], in)
+    field ที่ไม่ได้กำหนดจะไม่ปรากฏใน mapping เหมือน key ที่ไม่มีใน dict
+    """
+    
+    _FIELD_NAMES = (
+        # OHLC
+        'open', 'high', 'low', 'close', 'volume', 'timestamp',
+        # Calculated properties
+        'body_size', 'range_size', 'body_ratio', 'upper_wick', 'lower_wick',
+        'upper_wick_ratio', 'lower_wick_ratio',
+        # Classification
+        'candle_color', 'candle_type', 'is_bullish', 'is_bearish', 'is_doji',
+        # Price direction
+        'previous_close', 'previous_open', 'close_vs_previous', 'price_direction',
+        'price_change_from_previous', 'price_change_points',
+        # Volume
+        'volume_available', 'volume_factor', 'volume_analysis', 'avg_volume',
+        # Multi-candle context
+        'multi_candle_context', 'mini_trend_signals',
+        # Market condition
+        'market_condition', 'volatility_level', 'volatility_ratio', 'trend_direction', 'session_info',
+        # Metadata
+        'analysis_quality', 'analysis_timestamp', 'candles_used_count',
+        'symbol', 'timeframe', 'candle_timestamp', 'total_candles_analyzed', 'analyzer_version'
+    )
+    __slots__ = _FIELD_NAMES + ('_frozen',)
+    _FIELDS = frozenset(_FIELD_NAMES)
+    
+    def __init__(self):
+        object.__setattr__(self, '_frozen', False)
+    
+    # instance ที่สร้างผ่าน object.__new__ (copy/pickle) ยังไม่มี _frozen - ถือว่าแก้ไขได้
+    def __setattr__(self, name: str, value: Any):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f"CandleAnalysis is read-only: cannot set '{name}'")
+        object.__setattr__(self, name, value)
+    
+    def __delattr__(self, name: str):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f"CandleAnalysis is read-only: cannot delete '{name}'")
+        object.__delattr__(self, name)
+    
+    def _set_fields(self, values: Dict[str, Any]):
+        """📝 รวมผลจาก helper ที่คืน dict (ใช้ใน _analyze_single_candle เท่านั้น)"""
+        for key, value in values.items():
+            setattr(self, key, value)
+    
+    def _freeze(self):
+        """🔒 ปิดการแก้ไข - เรียกครั้งเดียวหลังสร้างเสร็จ ก่อนแชร์ผ่าน cache"""
+        object.__setattr__(self, '_frozen', True)
+    
+    def __reduce__(self):
+        """📦 copy/deepcopy/pickle - สร้างใหม่จาก fields แล้ว freeze ตามต้นฉบับ"""
+        return (_restore_candle_analysis, (self.to_dict(), self._frozen))
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._FIELDS:
+            return getattr(self, key, default)
+        return default
+    
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+    
+    def __contains__(self, key: object) -> bool:
+        return key in self._FIELDS and hasattr(self, key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in self._FIELD_NAMES if hasattr(self, name))
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+    
+    def __repr__(self) -> str:
+        return f"CandleAnalysis({self.to_dict()!r})"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """📤 แปลงเป็น dict ธรรมดา (สำหรับ JSON / โค้ดเดิมที่ต้องการ dict)"""
+        return {name: getattr(self, name) for name in self}
+
+
+def _restore_candle_analysis(fields: Dict[str, Any], frozen: bool) -> CandleAnalysis:
+    """📦 สร้าง CandleAnalysis กลับจาก __reduce__"""
+    analysis = CandleAnalysis()
+    analysis._set_fields(fields)
+    if frozen:
+        analysis._freeze()
+    return analysis
+
+
+class VolumeInfo(NamedTuple):
+    """📊 ผล volume analysis - tuple ธรรมดา ไม่ต้องสร้าง dict ทุกรอบ"""
+    volume_available: bool
+    volume_factor: float
+    volume_analysis: str
+    avg_volume: float
+
+
+def _candle_kernel(open_price: float, high_price: float, low_price: float,
+                   close_price: float) -> Tuple[float, ...]:
+    """
+    📐 คำนวณตัวเลขพื้นฐานของแท่งเทียน - scalar arithmetic ล้วน ไม่แตะ dict
+    
+    Returns:
+        (body_size, range_size, upper_wick, lower_wick,
+         body_ratio, upper_wick_ratio, lower_wick_ratio,
+         price_change, price_change_percent)
+    """
+    price_change = close_price - open_price
+    range_size = high_price - low_price
+    
+    # ตัว body บน/ล่าง + ขนาด body - สูตรเดียวใช้ได้ทั้งแท่งเขียว แดง และ doji (เทียบครั้งเดียว ไม่ต้องเรียก abs)
+    if price_change < 0:
+        body_size = -price_change
+        upper_wick = high_price - open_price
+        lower_wick = close_price - low_price
+    else:
+        body_size = price_change
+        upper_wick = high_price - close_price
+        lower_wick = open_price - low_price
+    
+    if range_size > 0:
+        body_ratio = body_size / range_size
+        upper_wick_ratio = upper_wick / range_size
+        lower_wick_ratio = lower_wick / range_size
+    else:
+        body_ratio = 0.0
+        upper_wick_ratio = 0.0
+        lower_wick_ratio = 0.0
+    
+    price_change_percent = (price_change / open_price) * 100 if open_price > 0 else 0
+    
+    return (body_size, range_size, upper_wick, lower_wick,
+            body_ratio, upper_wick_ratio, lower_wick_ratio,
+            price_change, price_change_percent)
+
+
+@lru_cache(maxsize=1024)
+def _classify_candle_type_cached(body_ratio: float, upper_wick_ratio: float, lower_wick_ratio: float,
+                                 is_bullish: bool, thresholds: Tuple[float, ...]) -> str:
+    """
+    🏷️ จำแนกประเภทแท่งเทียนจาก ratios - pure function จึง cache ได้
+    
+    แท่งปิดแล้วถูกจำแนกซ้ำทุกครั้งที่ fetch จึงได้ cache hit เกือบทุกแท่ง
+    """
+    (doji_threshold, strong_body_threshold, hammer_wick_ratio, shooting_star_ratio,
+     long_legged_wick, dominant_wick) = thresholds
+    
+    # Doji patterns
+    if body_ratio < doji_threshold:
+        if upper_wick_ratio > long_legged_wick and lower_wick_ratio > long_legged_wick:
+            return 'long_legged_doji'
+        elif upper_wick_ratio > dominant_wick:
+            return 'dragonfly_doji'
+        elif lower_wick_ratio > dominant_wick:
+            return 'gravestone_doji'
+        else:
+            return 'doji'
+    
+    # Strong body candles
+    elif body_ratio > strong_body_threshold:
+        if is_bullish:
+            return 'strong_bullish'
+        else:
+            return 'strong_bearish'
+    
+    # Hammer patterns  
+    elif lower_wick_ratio > hammer_wick_ratio * body_ratio and upper_wick_ratio < body_ratio:
+        if is_bullish:
+            return 'hammer_bullish'
+        else:
+            return 'hammer_bearish'
+    
+    # Shooting star patterns
+    elif upper_wick_ratio > shooting_star_ratio * body_ratio and lower_wick_ratio < body_ratio:
+        if is_bullish:
+            return 'shooting_star_bullish'
+        else:
+            return 'shooting_star_bearish'
+    
+    # Regular candles
+    else:
+        if is_bullish:
+            return 'bullish'
+        else:
+            return 'bearish'
+
 
 class CandlestickAnalyzer:
     """
@@ -35,6 +262,61 @@ class CandlestickAnalyzer:
     เตรียมข้อมูลสำหรับ Smart Signal Generator
     """
     
+    # attribute ทั้งหมดต้องประกาศที่นี่ (รวม persistence_manager ที่ data_persistence กำหนดให้)
+    __slots__ = (
+        'mt5_connector', 'config', 'symbol', 'timeframe',
+        'min_candles_required', 'max_candles_lookback', 'volume_lookback_periods',
+        'mini_trend_min_body_ratio', '_bars_needed',
+        'doji_threshold', 'strong_body_threshold', 'hammer_wick_ratio', 'shooting_star_ratio',
+        '_classify_thresholds',
+        'volume_spike_threshold', 'volume_confirmation_enabled', 'volume_fallback_enabled',
+        '_volume_bins',
+        'last_analysis_time', 'last_analyzed_candle_time', '_last_analysis_mono',
+        'cache_duration_seconds', 'cached_analysis', '_cached_candle_key',
+        'volume_available', 'volume_history', 'max_volume_history', 'avg_volume',
+        '_rates_field_count',
+        'processed_signatures', 'max_signature_history', 'persistence_manager',
+        'last_candle_signature', 'last_processed_candle_time', 'minimum_time_gap_seconds',
+        'analysis_count', 'successful_analysis', 'error_count', 'avg_analysis_time'
+    )
+    
+    # ค่าคงที่ของ analysis (โหลดครั้งเดียวที่ระดับ class)
+    _DOJI_LONG_LEGGED_WICK: Final[float] = 0.4
+    _DOJI_DOMINANT_WICK: Final[float] = 0.6
+    _VOLUME_ABOVE_AVERAGE: Final[float] = 1.2
+    _VOLUME_BELOW_AVERAGE: Final[float] = 0.8
+    _VOLUME_LEVELS: Final[Tuple[str, ...]] = ('below_average', 'normal', 'above_average', 'high')
+    _VOLATILITY_VERY_HIGH: Final[float] = 2.0
+    _VOLATILITY_HIGH: Final[float] = 1.5
+    _VOLATILITY_ABOVE_NORMAL: Final[float] = 1.2
+    _VOLATILITY_LOW: Final[float] = 0.6
+    
+    # ตาราง bucket สำหรับ bisect_right / np.searchsorted(side='right')
+    # ขอบล่างสุดเป็นแบบ <= จึงเลื่อนไป float ถัดไป
+    _VOLATILITY_BINS: Final[Tuple[float, ...]] = (
+        math.nextafter(_VOLATILITY_LOW, math.inf),
+        _VOLATILITY_ABOVE_NORMAL, _VOLATILITY_HIGH, _VOLATILITY_VERY_HIGH
+    )
+    _VOLATILITY_LEVELS: Final[Tuple[str, ...]] = ('low', 'normal', 'above_normal', 'high', 'very_high')
+    _SIDEWAYS_RANGE_FACTOR: Final[float] = 0.5
+    _ESTIMATED_VOLUME_MIN: Final[float] = 0.5
+    _ESTIMATED_VOLUME_MAX: Final[float] = 2.0
+    _BODY_VOLUME_FACTOR_MAX: Final[float] = 1.5
+    _BASE_QUALITY: Final[float] = 0.5
+    _DATA_QUALITY_WEIGHT: Final[float] = 0.2
+    _VOLUME_QUALITY_BONUS: Final[float] = 0.1
+    _SUCCESS_QUALITY_WEIGHT: Final[float] = 0.2
+    
+    # (session, activity, overlap) ตามชั่วโมง 0-23
+    _SESSION_BY_HOUR: Final[Tuple[Tuple[str, str, Optional[str]], ...]] = (
+        (('quiet', 'low', None),)
+        + (('asian', 'medium', None),) * 8
+        + (('london', 'high', 'london_asian'),) * 2
+        + (('london', 'high', None),) * 6
+        + (('newyork', 'high', 'london_newyork'),) * 2
+        + (('newyork', 'high', None),) * 5
+    )
+    
     def __init__(self, mt5_connector, config: Dict):
         """
         🔧 เริ่มต้น Smart Candlestick Analyzer
@@ -54,33 +336,52 @@ class CandlestickAnalyzer:
         self.min_candles_required = 3  # สำหรับ mini trend
         self.max_candles_lookback = 20
         self.volume_lookback_periods = 10
+        # จำนวนแท่งที่ดึงต่อรอบ (รวมแท่งที่ยังไม่ปิด) - ดึงอย่างน้อย 5 แท่ง
+        self._bars_needed = max(self.min_candles_required, 5)
+        self.mini_trend_min_body_ratio = config.get("smart_entry_rules", {}).get("mini_trend", {}).get("min_body_ratio", 0.05)
         
         # Pattern recognition settings
         self.doji_threshold = 0.05
         self.strong_body_threshold = 0.6
         self.hammer_wick_ratio = 2.0
         self.shooting_star_ratio = 2.0
+        # tuple thresholds สำหรับ _classify_candle_type_cached - สร้างครั้งเดียว (เป็น cache key ด้วย)
+        self._classify_thresholds = (
+            self.doji_threshold, self.strong_body_threshold,
+            self.hammer_wick_ratio, self.shooting_star_ratio,
+            self._DOJI_LONG_LEGGED_WICK, self._DOJI_DOMINANT_WICK
+        )
         
         # Volume analysis settings
         self.volume_spike_threshold = 1.5
         self.volume_confirmation_enabled = config.get("volume", {}).get("enabled", True)
         self.volume_fallback_enabled = True
+        self._volume_bins = (
+            math.nextafter(self._VOLUME_BELOW_AVERAGE, math.inf),
+            min(self._VOLUME_ABOVE_AVERAGE, self.volume_spike_threshold),
+            self.volume_spike_threshold
+        )
         
         # 🔧 CACHE MANAGEMENT
         self.last_analysis_time = datetime.min
         self.last_analyzed_candle_time = datetime.min
+        self._last_analysis_mono = 0.0  # time.monotonic() สำหรับ cache TTL
         self.cache_duration_seconds = 5
         self.cached_analysis = None
+        self._cached_candle_key = None  # (timestamp, close) ของแท่งที่อยู่ใน cache
         
         # 🔧 VOLUME TRACKING
         self.volume_available = False
-        self.volume_history = []
         self.max_volume_history = 20
+        self.volume_history = deque(maxlen=self.max_volume_history)
         self.avg_volume = 0.0
+        # schema ของ rates คงที่ต่อ symbol - ตรวจครั้งแรกที่ดึงได้แล้วเก็บไว้ (0 = ยังไม่ได้ตรวจ)
+        self._rates_field_count = 0
         
         # 🆕 SIGNATURE TRACKING สำหรับ mini trend
         self.processed_signatures = set()
         self.max_signature_history = 500
+        self.persistence_manager = None
         
         # 🆕 CANDLE STATE TRACKING
         self.last_candle_signature = None
@@ -103,17 +404,21 @@ class CandlestickAnalyzer:
     # 🎯 MAIN ANALYSIS METHOD (คงชื่อเดิม)
     # ==========================================
     
-    def get_current_analysis(self) -> Optional[Dict]:
+    def get_current_analysis(self) -> Optional[CandleAnalysis]:
         """
         🎯 วิเคราะห์แท่งเทียนปัจจุบัน - Enhanced for Mini Trend
         
         คงชื่อ method เดิม แต่เพิ่มข้อมูลสำหรับ Smart Signal Generator
         
         Returns:
-            Dict: ข้อมูลการวิเคราะห์ + fields ใหม่สำหรับ mini trend
+            CandleAnalysis: ข้อมูลการวิเคราะห์ + fields ใหม่สำหรับ mini trend
+            (read-only mapping ที่แชร์กับ cache - ใช้ .to_dict() ถ้าต้องการ dict)
+            แท่งปิดล่าสุดเดิมหลัง cache หมดอายุ: ใช้ค่าของแท่งจาก cache แต่
+            analysis_timestamp / session_info / analysis_quality และสถิติอัพเดททุกรอบเหมือนเดิม
         """
         try:
             analysis_start = time.time()
+            now = datetime.now()  # ใช้เวลาเดียวกันตลอดรอบ analysis
             
             if not self._is_ready_for_analysis():
                 return None
@@ -122,42 +427,60 @@ class CandlestickAnalyzer:
             if self._is_cache_valid():
                 return self.cached_analysis
             
+            # ดึงข้อมูล rates (call เดียวต่อรอบ)
+            rates = self._fetch_rates()
+            if rates is None:
+                return None
+            
+            # แท่งปิดล่าสุดยังเป็นแท่งเดิม = ค่าจากแท่งเดิม แต่ fields ที่ขึ้นกับเวลา/สถิติคำนวณใหม่
+            # เช็คจาก raw rates ก่อนสร้าง candle dicts / classification ทั้งหมด
+            latest_closed = rates[-2]
+            candle_key = (int(latest_closed['time']), float(latest_closed['close']))
+            if self.cached_analysis is not None and candle_key == self._cached_candle_key:
+                analysis_result = self._refresh_cached_analysis(now)
+                self.cached_analysis = analysis_result
+                self.last_analysis_time = now
+                self._last_analysis_mono = time.monotonic()
+                self._update_performance_stats(time.time() - analysis_start, True)
+                return analysis_result
+            
             # ดึงข้อมูล candles
-            candles_data = self._get_candles_for_analysis()
+            candles_data = self._get_candles_for_analysis(rates)
             if not candles_data or len(candles_data) < self.min_candles_required:
                 print(f"❌ ไม่เพียงพอสำหรับ analysis: {len(candles_data) if candles_data else 0} candles")
                 return None
             
             # วิเคราะห์แท่งปัจจุบัน (เดิม + ปรับปรุง)
             current_candle = candles_data[-1]  # แท่งล่าสุด
-            analysis_result = self._analyze_single_candle(current_candle, candles_data)
+            analysis_result = self._analyze_single_candle(current_candle, candles_data, now)
             
-            if not analysis_result:
+            if analysis_result is None:
                 return None
             
             # 🆕 เพิ่มข้อมูล meta สำหรับ Smart Signal Generator
-            analysis_result.update({
-                'symbol': self.symbol,
-                'timeframe': 'M1',
-                'candle_timestamp': int(current_candle['timestamp']),
-                'analysis_timestamp': datetime.now(),
-                'total_candles_analyzed': len(candles_data),
-                'analyzer_version': 'smart_v2.0'
-            })
+            analysis_result.symbol = self.symbol
+            analysis_result.timeframe = 'M1'
+            analysis_result.candle_timestamp = int(current_candle['timestamp'])
+            analysis_result.analysis_timestamp = now
+            analysis_result.total_candles_analyzed = len(candles_data)
+            analysis_result.analyzer_version = 'smart_v2.0'
             
             # บันทึก cache
+            _format_for_api(analysis_result)
+            analysis_result._freeze()
             self.cached_analysis = analysis_result
-            self.last_analysis_time = datetime.now()
+            self._cached_candle_key = candle_key
+            self._last_analysis_mono = time.monotonic()
+            self.last_analysis_time = now
             self.last_analyzed_candle_time = datetime.fromtimestamp(current_candle['timestamp'])
             
             # อัพเดทสถิติ
             analysis_time = time.time() - analysis_start
             self._update_performance_stats(analysis_time, True)
             
-            print(f"🕯️ Analysis completed for {self.symbol}")
-            print(f"   Candle: {analysis_result['candle_color']} body {analysis_result['body_ratio']:.3f}")
-            print(f"   Timestamp: {analysis_result['candle_timestamp']}")
-            print(f"   Analysis time: {analysis_time*1000:.1f}ms")
+            logger.debug("🕯️ Analysis completed for %s: %s body %.3f, timestamp %s, %.1fms",
+                         self.symbol, analysis_result['candle_color'], analysis_result['body_ratio'],
+                         analysis_result['candle_timestamp'], analysis_time * 1000)
             
             return analysis_result
             
@@ -166,24 +489,44 @@ class CandlestickAnalyzer:
             self._update_performance_stats(0, False)
             return None
     
+    def _refresh_cached_analysis(self, now: datetime) -> CandleAnalysis:
+        """
+        🔄 แท่งปิดล่าสุดยังเป็นแท่งเดิม - ใช้ค่าของแท่งจาก cache
+        
+        คำนวณใหม่เฉพาะ fields ที่ขึ้นกับเวลาและสถิติ (analysis_timestamp,
+        session_info, analysis_quality) เหมือน analysis เต็มรอบ แล้วคืน object ใหม่
+        (ตัวเดิมถูก freeze และอาจถูกผู้เรียกถือไว้อยู่)
+        """
+        fields = self.cached_analysis.to_dict()
+        fields['analysis_timestamp'] = now
+        if fields.get('session_info'):
+            fields['session_info'] = self._detect_trading_session(now)
+        fields['analysis_quality'] = self._calculate_analysis_quality(fields['candles_used_count'])
+        self.successful_analysis += 1
+        
+        analysis_result = CandleAnalysis()
+        analysis_result._set_fields(fields)
+        _format_for_api(analysis_result)
+        analysis_result._freeze()
+        return analysis_result
+    
     # ==========================================
     # 🆕 ENHANCED DATA COLLECTION
     # ==========================================
     
-    def _get_candles_for_analysis(self) -> Optional[List[Dict]]:
+    def _fetch_rates(self) -> Optional[np.ndarray]:
         """
-        🔍 ดึงข้อมูล candles สำหรับ analysis - Enhanced
+        📥 ดึง rates จาก MT5 - call เดียวใช้ทั้ง OHLC, volume และ market condition
         
-        ดึงข้อมูลหลายแท่งเพื่อรองรับ mini trend analysis
+        Returns:
+            structured array (แถวสุดท้ายคือแท่งที่ยังไม่ปิด) หรือ None
         """
         try:
             if not self.mt5_connector.is_connected:
                 print(f"❌ MT5 ไม่ได้เชื่อมต่อ")
                 return None
             
-            # ดึงข้อมูล rates จาก MT5
-            candle_count = max(self.min_candles_required, 5)  # ดึงอย่างน้อย 5 แท่ง
-            rates = mt5.copy_rates_from_pos(self.symbol, self.timeframe, 0, candle_count)
+            rates = mt5.copy_rates_from_pos(self.symbol, self.timeframe, 0, self._bars_needed)
             
             if rates is None:
                 print(f"❌ ไม่สามารถดึง rates สำหรับ {self.symbol}")
@@ -193,23 +536,54 @@ class CandlestickAnalyzer:
                 print(f"❌ Rates ไม่เพียงพอ: {len(rates)} < {self.min_candles_required}")
                 return None
             
+            return rates
+            
+        except Exception as e:
+            print(f"❌ Fetch rates error: {e}")
+            return None
+    
+    def _get_candles_for_analysis(self, rates: Optional[np.ndarray] = None) -> Optional[List[Dict]]:
+        """
+        🔍 ดึงข้อมูล candles สำหรับ analysis - Enhanced
+        
+        ดึงข้อมูลหลายแท่งเพื่อรองรับ mini trend analysis
+        
+        Args:
+            rates: rates ที่ดึงมาแล้วจาก _fetch_rates (None = ดึงใหม่)
+        """
+        try:
+            if rates is None:
+                rates = self._fetch_rates()
+                if rates is None:
+                    return None
+            
             # แปลงเป็น format ที่ใช้งาน - ใช้แท่งปิดแล้วเท่านั้น
+            # tolist() แปลงทุกแถวเป็น tuple ของ Python scalars ในครั้งเดียว
+            if not self._rates_field_count:
+                self._rates_field_count = len(rates.dtype.names)
+            field_count = self._rates_field_count
+            has_volume = field_count > 5
+            has_real_volume = field_count > 6
+            
+            # bind เป็น local ก่อน loop - ไม่ต้อง lookup attribute ทุกแท่ง
+            calculate_properties = self._calculate_candle_properties
             candles = []
-            for i, rate in enumerate(rates[:-1]):
+            append_candle = candles.append
+            for i, rate in enumerate(rates[:-1].tolist()):
                 try:
                     candle = {
-                        'timestamp': int(rate[0]),  # rates[i][0] = timestamp
-                        'open': float(rate[1]),     # rates[i][1] = open
-                        'high': float(rate[2]),     # rates[i][2] = high
-                        'low': float(rate[3]),      # rates[i][3] = low
-                        'close': float(rate[4]),    # rates[i][4] = close
-                        'volume': int(rate[5]) if len(rate) > 5 else 0,  # rates[i][5] = volume
-                        'real_volume': int(rate[6]) if len(rate) > 6 else 0
+                        'timestamp': rate[0],  # rates[i][0] = timestamp
+                        'open': rate[1],       # rates[i][1] = open
+                        'high': rate[2],       # rates[i][2] = high
+                        'low': rate[3],        # rates[i][3] = low
+                        'close': rate[4],      # rates[i][4] = close
+                        'volume': rate[5] if has_volume else 0,  # rates[i][5] = volume
+                        'real_volume': rate[6] if has_real_volume else 0
                     }
                     
                     # คำนวณ derived values
-                    self._calculate_candle_properties(candle)
-                    candles.append(candle)
+                    calculate_properties(candle)
+                    append_candle(candle)
                     
                 except Exception as e:
                     print(f"⚠️ Error processing candle {i}: {e}")
@@ -219,7 +593,7 @@ class CandlestickAnalyzer:
                 print(f"❌ Processed closed candles ไม่เพียงพอ: {len(candles)}")
                 return None
             
-            print(f"🕯️ Successfully processed {len(candles)} CLOSED candles")
+            logger.debug("🕯️ Successfully processed %d CLOSED candles", len(candles))
             return candles
             
         except Exception as e:
@@ -238,171 +612,135 @@ class CandlestickAnalyzer:
             low_price = candle['low']
             close_price = candle['close']
             
+            (body_size, range_size, upper_wick, lower_wick,
+             body_ratio, upper_wick_ratio, lower_wick_ratio,
+             price_change, price_change_percent) = _candle_kernel(open_price, high_price, low_price, close_price)
+            
             # Basic calculations
-            candle['body_size'] = abs(close_price - open_price)
-            candle['range_size'] = high_price - low_price
-            candle['upper_wick'] = high_price - max(open_price, close_price)
-            candle['lower_wick'] = min(open_price, close_price) - low_price
+            candle['body_size'] = body_size
+            candle['range_size'] = range_size
+            candle['upper_wick'] = upper_wick
+            candle['lower_wick'] = lower_wick
             
             # Ratios
-            if candle['range_size'] > 0:
-                candle['body_ratio'] = candle['body_size'] / candle['range_size']
-                candle['upper_wick_ratio'] = candle['upper_wick'] / candle['range_size']
-                candle['lower_wick_ratio'] = candle['lower_wick'] / candle['range_size']
-            else:
-                candle['body_ratio'] = 0.0
-                candle['upper_wick_ratio'] = 0.0
-                candle['lower_wick_ratio'] = 0.0
+            candle['body_ratio'] = body_ratio
+            candle['upper_wick_ratio'] = upper_wick_ratio
+            candle['lower_wick_ratio'] = lower_wick_ratio
             
             # Candle color และ type
             candle['candle_color'] = 'green' if close_price > open_price else 'red'
             candle['is_bullish'] = close_price > open_price
             candle['is_bearish'] = close_price < open_price
-            candle['is_doji'] = candle['body_ratio'] < self.doji_threshold
+            candle['is_doji'] = body_ratio < self.doji_threshold
             
             # Price movement info (สำหรับ Signal Generator)
-            candle['price_change'] = close_price - open_price
-            candle['price_change_abs'] = abs(candle['price_change'])
-            candle['price_change_percent'] = (candle['price_change'] / open_price) * 100 if open_price > 0 else 0
+            candle['price_change'] = price_change
+            candle['price_change_abs'] = body_size
+            candle['price_change_percent'] = price_change_percent
             
             # 🆕 เพิ่ม fields สำหรับ compatibility
-            candle['candle_type'] = self._classify_candle_type(candle)
+            candle['candle_type'] = self._classify_candle_type(
+                body_ratio, upper_wick_ratio, lower_wick_ratio, close_price > open_price
+            )
             
         except Exception as e:
             print(f"❌ Calculate candle properties error: {e}")
     
-    def _classify_candle_type(self, candle: Dict) -> str:
+    def _classify_candle_type(self, body_ratio: float, upper_wick_ratio: float,
+                              lower_wick_ratio: float, is_bullish: bool) -> str:
         """
         🏷️ จำแนกประเภทแท่งเทียน - Enhanced
+        
+        รับ ratios เป็น float ตรงๆ จากผู้เรียก (ไม่ต้องอ่านกลับจาก candle dict)
         """
         try:
-            body_ratio = candle['body_ratio']
-            upper_wick_ratio = candle['upper_wick_ratio']  
-            lower_wick_ratio = candle['lower_wick_ratio']
-            is_bullish = candle['is_bullish']
-            
-            # Doji patterns
-            if body_ratio < self.doji_threshold:
-                if upper_wick_ratio > 0.4 and lower_wick_ratio > 0.4:
-                    return 'long_legged_doji'
-                elif upper_wick_ratio > 0.6:
-                    return 'dragonfly_doji'
-                elif lower_wick_ratio > 0.6:
-                    return 'gravestone_doji'
-                else:
-                    return 'doji'
-            
-            # Strong body candles
-            elif body_ratio > self.strong_body_threshold:
-                if is_bullish:
-                    return 'strong_bullish'
-                else:
-                    return 'strong_bearish'
-            
-            # Hammer patterns  
-            elif lower_wick_ratio > self.hammer_wick_ratio * body_ratio and upper_wick_ratio < body_ratio:
-                if is_bullish:
-                    return 'hammer_bullish'
-                else:
-                    return 'hammer_bearish'
+            return _classify_candle_type_cached(
+                body_ratio, upper_wick_ratio, lower_wick_ratio, is_bullish,
+                self._classify_thresholds
+            )
             
-            # Shooting star patterns
-            elif upper_wick_ratio > self.shooting_star_ratio * body_ratio and lower_wick_ratio < body_ratio:
-                if is_bullish:
-                    return 'shooting_star_bullish'
-                else:
-                    return 'shooting_star_bearish'
-            
-            # Regular candles
-            else:
-                if is_bullish:
-                    return 'bullish'
-                else:
-                    return 'bearish'
-                    
         except Exception as e:
             print(f"❌ Candle classification error: {e}")
             return 'unknown'
     
-    def _analyze_single_candle(self, current_candle: Dict, all_candles: List[Dict]) -> Optional[Dict]:
+    def _analyze_single_candle(self, current_candle: Dict, all_candles: List[Dict],
+                               now: Optional[datetime] = None) -> Optional[CandleAnalysis]:
         """
         🔍 วิเคราะห์แท่งเทียนเดี่ยว - Enhanced with Context
         
         Args:
             current_candle: แท่งปัจจุบัน
             all_candles: แท่งทั้งหมดสำหรับ context
+            now: เวลาของรอบ analysis (None = datetime.now())
         """
         try:
-            analysis_result = {}
+            if now is None:
+                now = datetime.now()
+            
+            analysis_result = CandleAnalysis()
             
             # 1. Basic OHLC data (เดิม + enhanced)
-            analysis_result.update({
-                'open': current_candle['open'],
-                'high': current_candle['high'], 
-                'low': current_candle['low'],
-                'close': current_candle['close'],
-                'volume': current_candle['volume'],
-                'timestamp': current_candle['timestamp']
-            })
+            analysis_result.open = current_candle['open']
+            analysis_result.high = current_candle['high']
+            analysis_result.low = current_candle['low']
+            analysis_result.close = current_candle['close']
+            analysis_result.volume = current_candle['volume']
+            analysis_result.timestamp = current_candle['timestamp']
             
             # 2. Calculated properties (เดิม)
-            analysis_result.update({
-                'body_size': current_candle['body_size'],
-                'range_size': current_candle['range_size'],
-                'body_ratio': current_candle['body_ratio'],
-                'upper_wick': current_candle['upper_wick'],
-                'lower_wick': current_candle['lower_wick'],
-                'upper_wick_ratio': current_candle['upper_wick_ratio'],
-                'lower_wick_ratio': current_candle['lower_wick_ratio']
-            })
+            analysis_result.body_size = current_candle['body_size']
+            analysis_result.range_size = current_candle['range_size']
+            analysis_result.body_ratio = current_candle['body_ratio']
+            analysis_result.upper_wick = current_candle['upper_wick']
+            analysis_result.lower_wick = current_candle['lower_wick']
+            analysis_result.upper_wick_ratio = current_candle['upper_wick_ratio']
+            analysis_result.lower_wick_ratio = current_candle['lower_wick_ratio']
             
             # 3. Candle classification (เดิม)
-            analysis_result.update({
-                'candle_color': current_candle['candle_color'],
-                'candle_type': current_candle['candle_type'],
-                'is_bullish': current_candle['is_bullish'],
-                'is_bearish': current_candle['is_bearish'],
-                'is_doji': current_candle['is_doji']
-            })
+            analysis_result.candle_color = current_candle['candle_color']
+            analysis_result.candle_type = current_candle['candle_type']
+            analysis_result.is_bullish = current_candle['is_bullish']
+            analysis_result.is_bearish = current_candle['is_bearish']
+            analysis_result.is_doji = current_candle['is_doji']
             
             # 4. Price direction analysis (เดิม + enhanced)
             if len(all_candles) >= 2:
                 previous_candle = all_candles[-2]
-                analysis_result.update({
-                    'previous_close': previous_candle['close'],
-                    'previous_open': previous_candle['open'],
-                    'close_vs_previous': 'higher' if current_candle['close'] > previous_candle['close'] else 'lower',
-                    'price_direction': 'higher_close' if current_candle['close'] > previous_candle['close'] else 'lower_close',
-                    'price_change_from_previous': current_candle['close'] - previous_candle['close'],
-                    'price_change_points': abs(current_candle['close'] - previous_candle['close'])
-                })
+                analysis_result.previous_close = previous_candle['close']
+                analysis_result.previous_open = previous_candle['open']
+                # ทิศทาง + ขนาดจาก diff เดียว
+                change_from_previous = current_candle['close'] - previous_candle['close']
+                is_higher = change_from_previous > 0
+                analysis_result.close_vs_previous = 'higher' if is_higher else 'lower'
+                analysis_result.price_direction = 'higher_close' if is_higher else 'lower_close'
+                analysis_result.price_change_from_previous = change_from_previous
+                analysis_result.price_change_points = change_from_previous if change_from_previous >= 0 else -change_from_previous
             else:
-                analysis_result.update({
-                    'previous_close': current_candle['close'],
-                    'close_vs_previous': 'same',
-                    'price_direction': 'neutral',
-                    'price_change_from_previous': 0,
-                    'price_change_points': 0
-                })
+                analysis_result.previous_close = current_candle['close']
+                analysis_result.close_vs_previous = 'same'
+                analysis_result.price_direction = 'neutral'
+                analysis_result.price_change_from_previous = 0
+                analysis_result.price_change_points = 0
             
             # 5. Volume analysis (เดิม + enhanced)
-            volume_analysis = self._analyze_volume(current_candle, all_candles)
-            analysis_result.update(volume_analysis)
+            volume_info = self._analyze_volume(current_candle, all_candles)
+            analysis_result.volume_available = volume_info.volume_available
+            analysis_result.volume_factor = volume_info.volume_factor
+            analysis_result.volume_analysis = volume_info.volume_analysis
+            analysis_result.avg_volume = volume_info.avg_volume
             
             # 6. 🆕 Multi-candle context สำหรับ Mini Trend
             context_analysis = self._analyze_multi_candle_context(all_candles)
-            analysis_result.update(context_analysis)
+            analysis_result._set_fields(context_analysis)
             
             # 7. 🆕 Market condition assessment
-            market_condition = self._assess_market_condition(all_candles)
-            analysis_result.update(market_condition)
+            market_condition = self._assess_market_condition(all_candles, now)
+            analysis_result._set_fields(market_condition)
             
             # 8. Analysis metadata
-            analysis_result.update({
-                'analysis_quality': self._calculate_analysis_quality(all_candles),
-                'analysis_timestamp': datetime.now(),
-                'candles_used_count': len(all_candles)
-            })
+            analysis_result.analysis_quality = self._calculate_analysis_quality(len(all_candles))
+            analysis_result.analysis_timestamp = now
+            analysis_result.candles_used_count = len(all_candles)
             
             self.successful_analysis += 1
             
@@ -445,13 +783,13 @@ class CandlestickAnalyzer:
                 'green_count_in_3': green_count,
                 'red_count_in_3': red_count,
                 'dominant_color': 'green' if green_count > red_count else 'red' if red_count > green_count else 'mixed',
-                'trend_consistency': max(green_count, red_count) / 3.0
+                'trend_consistency': (green_count if green_count > red_count else red_count) / 3.0
             }
             
             # เช็คเงื่อนไข mini trend
             current_color = recent_3_candles[-1]['candle_color']
             current_body_ratio = recent_3_candles[-1]['body_ratio']
-            min_body_ratio = self.config.get("smart_entry_rules", {}).get("mini_trend", {}).get("min_body_ratio", 0.05)
+            min_body_ratio = self.mini_trend_min_body_ratio
             
             # Mini trend signals (ลบ old strength calculations)
             mini_trend_signals = {}
@@ -460,7 +798,7 @@ class CandlestickAnalyzer:
             if green_count >= 2 and current_color == 'green' and current_body_ratio >= min_body_ratio:
                 mini_trend_signals['buy_mini_trend_detected'] = True
                 # ลบ: mini_trend_signals['buy_trend_strength'] = self._calculate_mini_trend_strength(recent_3_candles, 'bullish')
-                print(f"🟢 Mini trend BUY detected: {colors}")
+                logger.debug("🟢 Mini trend BUY detected: %s", colors)
             else:
                 mini_trend_signals['buy_mini_trend_detected'] = False
             
@@ -468,7 +806,7 @@ class CandlestickAnalyzer:
             if red_count >= 2 and current_color == 'red' and current_body_ratio >= min_body_ratio:
                 mini_trend_signals['sell_mini_trend_detected'] = True
                 # ลบ: mini_trend_signals['sell_trend_strength'] = self._calculate_mini_trend_strength(recent_3_candles, 'bearish')
-                print(f"🔴 Mini trend SELL detected: {colors}")
+                logger.debug("🔴 Mini trend SELL detected: %s", colors)
             else:
                 mini_trend_signals['sell_mini_trend_detected'] = False
             
@@ -486,73 +824,52 @@ class CandlestickAnalyzer:
     # 🔧 VOLUME ANALYSIS (เดิม + ปรับปรุง)
     # ==========================================
     
-    def _analyze_volume(self, current_candle: Dict, all_candles: List[Dict]) -> Dict:
+    def _analyze_volume(self, current_candle: Dict, all_candles: List[Dict]) -> VolumeInfo:
         """
         📊 วิเคราะห์ volume - Enhanced with better fallback
         """
         try:
-            volume_result = {
-                'volume_available': False,
-                'volume_factor': 1.0,
-                'volume_analysis': 'unavailable',
-                'avg_volume': 0
-            }
+            volume_result = VolumeInfo(False, 1.0, 'unavailable', 0)
             
-            current_volume = current_candle.get('volume', 0)
+            current_volume = current_candle['volume']
             
             # ตรวจสอบว่ามี volume data หรือไม่
             if current_volume > 0 and len(all_candles) >= 5:
                 
-                # คำนวณ average volume
-                volumes = [c.get('volume', 0) for c in all_candles[-10:] if c.get('volume', 0) > 0]
+                # คำนวณ average volume จาก all_candles ที่ส่งเข้ามา (แท่งเดียวกับที่วิเคราะห์เสมอ)
+                volumes = np.array([c['volume'] for c in all_candles[-self.volume_lookback_periods:]])
+                volumes = volumes[volumes > 0]
                 
-                if volumes and len(volumes) >= 3:
-                    avg_volume = statistics.mean(volumes)
+                if volumes.size >= 3:
+                    avg_volume = float(volumes.mean())
                     self.avg_volume = avg_volume
                     self.volume_available = True
                     
                     volume_factor = current_volume / avg_volume if avg_volume > 0 else 1.0
                     
                     # Volume classification
-                    if volume_factor >= self.volume_spike_threshold:
-                        volume_analysis = 'high'
-                    elif volume_factor >= 1.2:
-                        volume_analysis = 'above_average' 
-                    elif volume_factor <= 0.8:
-                        volume_analysis = 'below_average'
-                    else:
-                        volume_analysis = 'normal'
+                    volume_analysis = self._VOLUME_LEVELS[bisect_right(self._volume_bins, volume_factor)]
                     
-                    volume_result.update({
-                        'volume_available': True,
-                        'volume_factor': round(volume_factor, 2),
-                        'volume_analysis': volume_analysis,
-                        'avg_volume': round(avg_volume, 0)
-                    })
+                    volume_result = VolumeInfo(True, volume_factor, volume_analysis, avg_volume)
                     
-                    print(f"📊 Volume: {current_volume:,} (avg: {avg_volume:,.0f}, factor: {volume_factor:.2f})")
+                    logger.debug("📊 Volume: %s (avg: %.0f, factor: %.2f)", current_volume, avg_volume, volume_factor)
                 
             else:
                 # Volume fallback - ใช้ราคาและ range แทน
                 if self.volume_fallback_enabled:
-                    volume_result.update({
-                        'volume_available': False,
-                        'volume_factor': self._estimate_volume_from_price_action(current_candle, all_candles),
-                        'volume_analysis': 'estimated_from_price',
-                        'avg_volume': 0
-                    })
-                    print(f"📊 Volume fallback used")
+                    volume_result = VolumeInfo(
+                        False,
+                        self._estimate_volume_from_price_action(current_candle, all_candles),
+                        'estimated_from_price',
+                        0
+                    )
+                    logger.debug("📊 Volume fallback used")
             
             return volume_result
             
         except Exception as e:
             print(f"❌ Volume analysis error: {e}")
-            return {
-                'volume_available': False,
-                'volume_factor': 1.0,
-                'volume_analysis': 'error',
-                'avg_volume': 0
-            }
+            return VolumeInfo(False, 1.0, 'error', 0)
     
     def _estimate_volume_from_price_action(self, current_candle: Dict, all_candles: List[Dict]) -> float:
         """
@@ -569,10 +886,16 @@ class CandlestickAnalyzer:
             
             # ประมาณ volume factor
             range_factor = range_size / avg_range if avg_range > 0 else 1.0
-            body_factor = min(body_ratio * 2, 1.5)  # แท่งใหญ่ = volume เยอะ
+            body_factor = body_ratio * 2
+            if body_factor > self._BODY_VOLUME_FACTOR_MAX:  # แท่งใหญ่ = volume เยอะ
+                body_factor = self._BODY_VOLUME_FACTOR_MAX
             
             estimated_factor = (range_factor + body_factor) / 2
-            return round(max(0.5, min(estimated_factor, 2.0)), 2)
+            if estimated_factor > self._ESTIMATED_VOLUME_MAX:
+                return self._ESTIMATED_VOLUME_MAX
+            if estimated_factor < self._ESTIMATED_VOLUME_MIN:
+                return self._ESTIMATED_VOLUME_MIN
+            return estimated_factor
             
         except Exception as e:
             return 1.0
@@ -581,7 +904,7 @@ class CandlestickAnalyzer:
     # 🆕 MARKET CONDITION ASSESSMENT
     # ==========================================
     
-    def _assess_market_condition(self, candles: List[Dict]) -> Dict:
+    def _assess_market_condition(self, candles: List[Dict], now: Optional[datetime] = None) -> Dict:
         """
         🌍 ประเมินสภาวะตลาด - สำหรับ Smart Decision Making
         """
@@ -603,22 +926,13 @@ class CandlestickAnalyzer:
             
             volatility_ratio = current_range / avg_range if avg_range > 0 else 1.0
             
-            if volatility_ratio >= 2.0:
-                volatility_level = 'very_high'
-            elif volatility_ratio >= 1.5:
-                volatility_level = 'high'
-            elif volatility_ratio >= 1.2:
-                volatility_level = 'above_normal'
-            elif volatility_ratio <= 0.6:
-                volatility_level = 'low' 
-            else:
-                volatility_level = 'normal'
+            volatility_level = self._VOLATILITY_LEVELS[bisect_right(self._VOLATILITY_BINS, volatility_ratio)]
             
             # 2. วิเคราะห์ trend direction
             closes = [c['close'] for c in candles[-5:]]
             if len(closes) >= 2:
                 overall_change = closes[-1] - closes[0]
-                if abs(overall_change) < avg_range * 0.5:
+                if abs(overall_change) < avg_range * self._SIDEWAYS_RANGE_FACTOR:
                     trend_direction = 'sideways'
                 elif overall_change > 0:
                     trend_direction = 'uptrend'
@@ -626,11 +940,11 @@ class CandlestickAnalyzer:
                     trend_direction = 'downtrend'
             
             # 3. Session information  
-            session_info = self._detect_trading_session(datetime.now())
+            session_info = self._detect_trading_session(now if now is not None else datetime.now())
             
             condition_result.update({
                 'volatility_level': volatility_level,
-                'volatility_ratio': round(volatility_ratio, 2),
+                'volatility_ratio': volatility_ratio,
                 'trend_direction': trend_direction,
                 'session_info': session_info,
                 'market_condition': f"{volatility_level}_{trend_direction}"
@@ -643,39 +957,16 @@ class CandlestickAnalyzer:
             return {'market_condition': 'error'}
     
     def _detect_trading_session(self, current_time: datetime) -> Dict:
-        """🌍 ตรวจจับ trading session"""
-        try:
-            hour = current_time.hour
-            
-            if 1 <= hour < 9:
-                session = 'asian'
-                activity = 'medium'
-            elif 9 <= hour < 17:
-                session = 'london'
-                activity = 'high'
-            elif 17 <= hour <= 23:
-                session = 'newyork'
-                activity = 'high'
-            else:
-                session = 'quiet'
-                activity = 'low'
-            
-            # Overlap detection
-            overlap = None
-            if 9 <= hour < 11:
-                overlap = 'london_asian'
-            elif 17 <= hour < 19:
-                overlap = 'london_newyork'
-            
-            return {
-                'trading_session': session,
-                'session_activity': activity,
-                'session_overlap': overlap,
-                'current_hour': hour
-            }
-            
-        except Exception as e:
-            return {'trading_session': 'unknown', 'session_activity': 'medium'}
+        """🌍 ตรวจจับ trading session (hour 0-23 index ตารางได้เสมอ)"""
+        hour = current_time.hour
+        session, activity, overlap = self._SESSION_BY_HOUR[hour]
+        
+        return {
+            'trading_session': session,
+            'session_activity': activity,
+            'session_overlap': overlap,
+            'current_hour': hour
+        }
     
     # ==========================================
     # 🔧 UTILITY METHODS (เดิม + ปรับปรุง)
@@ -709,15 +1000,10 @@ class CandlestickAnalyzer:
     
     def _is_cache_valid(self) -> bool:
         """⏰ ตรวจสอบ cache validity"""
-        try:
-            if not self.cached_analysis:
-                return False
-            
-            time_diff = (datetime.now() - self.last_analysis_time).total_seconds()
-            return time_diff < self.cache_duration_seconds
-            
-        except Exception:
+        if self.cached_analysis is None:
             return False
+        
+        return time.monotonic() - self._last_analysis_mono < self.cache_duration_seconds
     
     def _update_performance_stats(self, analysis_time: float, success: bool):
         """📊 อัพเดทสถิติการทำงาน"""
@@ -738,28 +1024,136 @@ class CandlestickAnalyzer:
         except Exception as e:
             print(f"❌ Performance stats update error: {e}")
     
-    def _calculate_analysis_quality(self, candles: List[Dict]) -> float:
-        """🎯 คำนวณคุณภาพการวิเคราะห์"""
-        try:
-            quality_score = 0.5
+    def _calculate_analysis_quality(self, candle_count: int) -> float:
+        """🎯 คำนวณคุณภาพการวิเคราะห์ (arithmetic ล้วน - ผู้เรียกมี try/except ครอบแล้ว)"""
+        quality_score = self._BASE_QUALITY
+        
+        # Data quantity factor
+        data_factor = candle_count / 10.0
+        if data_factor > 1.0:
+            data_factor = 1.0
+        quality_score += data_factor * self._DATA_QUALITY_WEIGHT
+        
+        # Volume availability
+        if self.volume_available:
+            quality_score += self._VOLUME_QUALITY_BONUS
+        
+        # Success rate factor
+        if self.analysis_count > 0:
+            success_rate = self.successful_analysis / self.analysis_count
+            quality_score += success_rate * self._SUCCESS_QUALITY_WEIGHT
+        
+        return quality_score if quality_score < 1.0 else 1.0
+    
+    # ==========================================
+    # 🆕 BATCH ANALYSIS (backtest / historical scan)
+    # ==========================================
+    
+    def analyze_batch(self, n_bars: int) -> Optional[Dict[str, np.ndarray]]:
+        """
+        📚 วิเคราะห์แท่งปิดย้อนหลัง n_bars แท่งแบบ vectorized
+        
+        ดึง rates ครั้งเดียวแล้วคำนวณทุกแท่งเป็น NumPy arrays (SoA)
+        ผลเหมือน _calculate_candle_properties ทีละแท่ง แต่ไม่มี Python loop
+        
+        Args:
+            n_bars: จำนวนแท่งปิดที่ต้องการ
             
-            # Data quantity factor
-            data_factor = min(len(candles) / 10.0, 1.0)
-            quality_score += data_factor * 0.2
+        Returns:
+            Dict ของ arrays เรียงจากเก่าไปใหม่ หรือ None ถ้าดึงข้อมูลไม่ได้
+        """
+        try:
+            if not self.mt5_connector or not self.mt5_connector.is_connected:
+                print(f"❌ MT5 not connected")
+                return None
             
-            # Volume availability
-            if self.volume_available:
-                quality_score += 0.1
+            # +1 แท่งที่ยังไม่ปิด ซึ่งจะถูกตัดทิ้ง
+            rates = mt5.copy_rates_from_pos(self.symbol, self.timeframe, 0, n_bars + 1)
+            if rates is None or len(rates) < 2:
+                print(f"❌ ไม่สามารถดึง rates สำหรับ batch analysis: {self.symbol}")
+                return None
             
-            # Success rate factor
-            if self.analysis_count > 0:
-                success_rate = self.successful_analysis / self.analysis_count
-                quality_score += success_rate * 0.2
+            closed = rates[:-1]
+            o = closed['open'].astype(np.float64)
+            h = closed['high'].astype(np.float64)
+            l = closed['low'].astype(np.float64)
+            c = closed['close'].astype(np.float64)
+            
+            price_change = c - o
+            body_size = np.abs(price_change)
+            range_size = h - l
+            upper_wick = h - np.maximum(o, c)
+            lower_wick = np.minimum(o, c) - l
+            
+            has_range = range_size > 0
+            zeros = np.zeros_like(range_size)
+            body_ratio = np.divide(body_size, range_size, out=zeros.copy(), where=has_range)
+            upper_wick_ratio = np.divide(upper_wick, range_size, out=zeros.copy(), where=has_range)
+            lower_wick_ratio = np.divide(lower_wick, range_size, out=zeros.copy(), where=has_range)
+            
+            is_bullish = c > o
+            is_bearish = c < o
+            is_doji = body_ratio < self.doji_threshold
+            
+            # ลำดับเงื่อนไขเหมือน _classify_candle_type_cached (np.select เลือกข้อแรกที่เป็นจริง)
+            strong = body_ratio > self.strong_body_threshold
+            hammer = (lower_wick_ratio > self.hammer_wick_ratio * body_ratio) & (upper_wick_ratio < body_ratio)
+            star = (upper_wick_ratio > self.shooting_star_ratio * body_ratio) & (lower_wick_ratio < body_ratio)
+            candle_type = np.select(
+                [
+                    is_doji & (upper_wick_ratio > self._DOJI_LONG_LEGGED_WICK) & (lower_wick_ratio > self._DOJI_LONG_LEGGED_WICK),
+                    is_doji & (upper_wick_ratio > self._DOJI_DOMINANT_WICK),
+                    is_doji & (lower_wick_ratio > self._DOJI_DOMINANT_WICK),
+                    is_doji,
+                    strong & is_bullish,
+                    strong,
+                    hammer & is_bullish,
+                    hammer,
+                    star & is_bullish,
+                    star
+                ],
+                [
+                    'long_legged_doji', 'dragonfly_doji', 'gravestone_doji', 'doji',
+                    'strong_bullish', 'strong_bearish',
+                    'hammer_bullish', 'hammer_bearish',
+                    'shooting_star_bullish', 'shooting_star_bearish'
+                ],
+                default=np.where(is_bullish, 'bullish', 'bearish')
+            )
+            
+            # Context ข้ามแท่ง: close เทียบแท่งก่อน และจำนวนแท่งเขียวใน 3 แท่งล่าสุด
+            higher_close = np.zeros(len(c), dtype=bool)
+            higher_close[1:] = c[1:] > c[:-1]
+            green_count_in_3 = np.full(len(c), -1, dtype=np.int64)  # -1 = ข้อมูลไม่พอ
+            if len(c) >= 3:
+                green_count_in_3[2:] = sliding_window_view(is_bullish, 3).sum(axis=-1)
             
-            return round(min(quality_score, 1.0), 3)
+            return {
+                'timestamp': closed['time'].astype(np.int64),
+                'open': o,
+                'high': h,
+                'low': l,
+                'close': c,
+                'body_size': body_size,
+                'range_size': range_size,
+                'upper_wick': upper_wick,
+                'lower_wick': lower_wick,
+                'body_ratio': body_ratio,
+                'upper_wick_ratio': upper_wick_ratio,
+                'lower_wick_ratio': lower_wick_ratio,
+                'candle_color': np.where(is_bullish, 'green', 'red'),
+                'candle_type': candle_type,
+                'is_bullish': is_bullish,
+                'is_bearish': is_bearish,
+                'is_doji': is_doji,
+                'price_change': price_change,
+                'higher_close': higher_close,
+                'green_count_in_3': green_count_in_3
+            }
             
         except Exception as e:
-            return 0.5
+            print(f"❌ Batch analysis error: {e}")
+            return None
     
     # ==========================================
     # 🔧 MAINTENANCE & INFO METHODS (เดิม)
@@ -768,6 +1162,8 @@ class CandlestickAnalyzer:
     def clear_cache(self):
         """🗑️ ล้าง cache"""
         self.cached_analysis = None
+        self._cached_candle_key = None
+        self._last_analysis_mono = 0.0
         self.last_analysis_time = datetime.min
         print(f"🗑️ Analysis cache cleared")
     
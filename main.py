@@ -598,35 +598,6 @@ class EnhancedPureCandlestickGUI:
         except Exception as e:
             self.log(f"❌ Component initialization error: {e}")
 
-    def execute_margin_optimization(self):
-        """🔧 Optimize Margin"""
-        if self.position_monitor:
-            self.position_monitor.execute_close_action({'action_type': 'margin_optimization'})
-        else:
-            messagebox.showwarning("Warning", "Position Monitor not initialized")
-
-    def execute_volume_balance(self):
-        """⚖️ Balance Volume"""  
-        if self.position_monitor:
-            self.position_monitor.execute_close_action({'action_type': 'volume_balance'})
-        else:
-            messagebox.showwarning("Warning", "Position Monitor not initialized")
-            
-    def execute_smart_recovery(self):
-        """🎯 Smart Recovery"""
-        if self.position_monitor:
-            self.position_monitor.execute_close_action({'action_type': 'lot_aware_recovery'})
-        else:
-            messagebox.showwarning("Warning", "Position Monitor not initialized")
-
-    def refresh_lot_analysis(self):
-        """🔄 Refresh Analysis"""
-        if self.position_monitor:
-            self.position_monitor.force_lot_aware_analysis()
-            self.log("🔄 Lot analysis refreshed")
-        else:
-            messagebox.showwarning("Warning", "Position Monitor not initialized")
-
     # ==========================================
     # 🎮 ENHANCED TRADING METHODS
     # ==========================================
@@ -668,7 +639,7 @@ class EnhancedPureCandlestickGUI:
                 if self.candlestick_analyzer:
                     candlestick_data = self.candlestick_analyzer.get_current_analysis()
                     
-                    if not candlestick_data:
+                    if candlestick_data is None:
                         time.sleep(3)
                         continue
                     
@@ -21,7 +21,11 @@ order_executor.py
 import MetaTrader5 as mt5
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
+from collections import deque
 import time
+import logging
+
+logger = logging.getLogger(__name__)
 
 class OrderExecutor:
     """
@@ -59,6 +63,7 @@ class OrderExecutor:
         self.max_slippage = 10  # points
         self.executed_candle_timestamps = set()  
         self.max_timestamp_history = 100 
+        self._executed_candle_order = deque(maxlen=self.max_timestamp_history)  # ลำดับการล็อก สำหรับ evict ตัวเก่าสุด
 
         # Statistics tracking
         self.execution_stats = {
@@ -663,14 +668,10 @@ class OrderExecutor:
             bool: True = ส่งแล้ว (บล็อก), False = ยังไม่ส่ง (อนุญาต)
         """
         try:
-            if not hasattr(self, 'executed_candle_timestamps'):
-                self.executed_candle_timestamps = set()
-            
             is_sent = candle_timestamp in self.executed_candle_timestamps
             
-            print(f"🔒 ORDER LOCK CHECK:")
-            print(f"   Candle timestamp: {candle_timestamp}")
-            print(f"   Already executed: {'YES' if is_sent else 'NO'}")
+            logger.debug("🔒 ORDER LOCK CHECK: candle %s already executed: %s",
+                         candle_timestamp, 'YES' if is_sent else 'NO')
             
             if is_sent:
                 candle_time = datetime.fromtimestamp(candle_timestamp)
@@ -690,22 +691,16 @@ class OrderExecutor:
             candle_timestamp: timestamp ของแท่งเทียน
         """
         try:
-            if not hasattr(self, 'executed_candle_timestamps'):
-                self.executed_candle_timestamps = set()
-            
-            # เพิ่ม timestamp เข้า lock set
-            self.executed_candle_timestamps.add(candle_timestamp)
+            # เพิ่ม timestamp เข้า lock set - เต็มแล้ว evict ตัวเก่าสุดทีละตัว
+            if candle_timestamp not in self.executed_candle_timestamps:
+                if len(self._executed_candle_order) == self._executed_candle_order.maxlen:
+                    self.executed_candle_timestamps.discard(self._executed_candle_order[0])
+                self._executed_candle_order.append(candle_timestamp)
+                self.executed_candle_timestamps.add(candle_timestamp)
             
             candle_time = datetime.fromtimestamp(candle_timestamp)
             print(f"🔒 CANDLE LOCKED: {candle_time.strftime('%H:%M')} ({candle_timestamp})")
-            
-            # 🧹 ทำความสะอาด - เก็บแค่ 100 timestamps ล่าสุด
-            if len(self.executed_candle_timestamps) > self.max_timestamp_history:
-                timestamps_list = sorted(list(self.executed_candle_timestamps))
-                self.executed_candle_timestamps = set(timestamps_list[-50:])  # เก็บ 50 ตัวล่าสุด
-                print(f"🧹 Cleaned order locks: kept 50 most recent")
-            
-            print(f"📊 Total locked candles: {len(self.executed_candle_timestamps)}")
+            logger.debug("📊 Total locked candles: %d", len(self.executed_candle_timestamps))
             
         except Exception as e:
             print(f"❌ Lock candle error: {e}")
@@ -713,10 +708,7 @@ class OrderExecutor:
     def get_order_lock_stats(self) -> Dict:
         """📊 สถิติการล็อกออเดอร์"""
         try:
-            if not hasattr(self, 'executed_candle_timestamps'):
-                return {'total_locks': 0, 'recent_locks': []}
-            
-            recent_timestamps = sorted(list(self.executed_candle_timestamps))[-5:]
+            recent_timestamps = list(self._executed_candle_order)[-5:]
             recent_times = [datetime.fromtimestamp(ts).strftime('%H:%M') for ts in recent_timestamps]
             
             return {
@@ -731,10 +723,10 @@ class OrderExecutor:
     def clear_order_locks(self):
         """🗑️ ล้างการล็อกออเดอร์ทั้งหมด (สำหรับ debug)"""
         try:
-            if hasattr(self, 'executed_candle_timestamps'):
-                old_count = len(self.executed_candle_timestamps)
-                self.executed_candle_timestamps.clear()
-                print(f"🗑️ Cleared {old_count} order locks")
+            old_count = len(self.executed_candle_timestamps)
+            self.executed_candle_timestamps.clear()
+            self._executed_candle_order.clear()
+            print(f"🗑️ Cleared {old_count} order locks")
             return True
         except Exception as e:
             print(f"❌ Clear order locks error: {e}")
@@ -148,7 +148,8 @@ class SmartOrderRoleManager:
             
             # อัพเดท internal tracking
             self.order_roles = role_assignments.copy()
-            self.last_role_assignment_time = datetime.now()
+            now = datetime.now()  # ใช้เวลาเดียวกันทั้ง tracking และผลลัพธ์
+            self.last_role_assignment_time = now
             
             # 🎯 GENERATE SMART RECOMMENDATIONS
             recommendations = self._generate_smart_recommendations(positions, role_assignments, current_price)
@@ -162,8 +163,8 @@ class SmartOrderRoleManager:
             return {
                 'assignments': role_assignments,
                 'recommendations': recommendations,
-                'analysis_time': datetime.now(),
-                'market_context': self._get_market_context(current_price, positions)
+                'analysis_time': now,
+                'market_context': self._get_market_context(current_price, positions, now)
             }
             
         except Exception as e:
@@ -607,16 +608,28 @@ class SmartOrderRoleManager:
             print(f"❌ Get current price error: {e}")
             return None
     
-    def _get_market_context(self, current_price: float, positions: List[Dict]) -> Dict:
-        """วิเคราะห์ context ของ market"""
+    def _get_market_context(self, current_price: float, positions: List[Dict],
+                            now: Optional[datetime] = None) -> Dict:
+        """วิเคราะห์ context ของ market (วน positions รอบเดียว)"""
         try:
+            total_pnl = 0
+            buy_count = 0
+            sell_count = 0
+            for p in positions:
+                total_pnl += p.get('total_pnl', 0)
+                position_type = p.get('type')
+                if position_type == 'buy':
+                    buy_count += 1
+                elif position_type == 'sell':
+                    sell_count += 1
+            
             return {
                 'current_price': current_price,
                 'total_positions': len(positions),
-                'total_pnl': sum(p.get('total_pnl', 0) for p in positions),
-                'buy_positions': len([p for p in positions if p.get('type') == 'buy']),
-                'sell_positions': len([p for p in positions if p.get('type') == 'sell']),
-                'analysis_time': datetime.now()
+                'total_pnl': total_pnl,
+                'buy_positions': buy_count,
+                'sell_positions': sell_count,
+                'analysis_time': now if now is not None else datetime.now()
             }
             
         except Exception as e:
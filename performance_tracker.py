@@ -1239,8 +1239,8 @@ class PerformanceTracker:
                 'session_duration_hours': (datetime.now() - self.session_start_time).total_seconds() / 3600,
                 'largest_win': self.session_stats.get('largest_win', 0),
                 'largest_loss': self.session_stats.get('largest_loss', 0),
-                'current_streak': getattr(self, 'current_streak', 0),
-                'streak_type': getattr(self, 'streak_type', 'none')
+                'current_streak': self.current_streak,
+                'streak_type': self.streak_type
             }
             
         except Exception as e:
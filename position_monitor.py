@@ -850,18 +850,6 @@ class PositionMonitor:
             print(f"❌ Enhanced profit opportunities error: {e}")
             return []
         
-    # เพิ่ม method ใหม่ก่อน
-    def calculate_volume_adjusted_threshold(self, volume: float, position_type: str = 'profit') -> float:
-        """🧮 คำนวณ threshold แบบ volume-adjusted + real spread"""
-        try:
-            base_threshold = volume * 100.0
-            current_spread = self.mt5_connector.get_current_spread(self.symbol)
-            spread_buffer = current_spread * 2.0
-            final_threshold = base_threshold + spread_buffer
-            return max(final_threshold, 1.0)
-        except:
-            return volume * 100.0 + 2.0
-        
     # ==========================================
     # ⚡ ENHANCED EXECUTION METHODS  
     # ==========================================
@@ -25,9 +25,14 @@ signal_generator.py
 
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
+from collections import deque
+from bisect import bisect_right
 import time
+import logging
 import MetaTrader5 as mt5
 
+logger = logging.getLogger(__name__)
+
 class SignalGenerator:
     """
     🎯 Smart Frequent Signal Generator
@@ -36,6 +41,59 @@ class SignalGenerator:
     พร้อม Portfolio Balance และ Dynamic Lot Sizing
     """
     
+    # attribute ทั้งหมดต้องประกาศที่นี่ (รวม persistence_manager ที่ data_persistence กำหนดให้)
+    __slots__ = (
+        'candlestick_analyzer', 'config',
+        'smart_rules', 'mini_trend_config', 'balance_config', 'lot_config', 'filter_config',
+        'cooldown_seconds', '_cooldown_ns', 'max_signals_per_hour', 'high_frequency_mode',
+        'last_signal_time', '_last_signal_ns', 'signal_history', 'total_signals_today', 'last_reset_date',
+        'signals_generated', 'signal_quality_scores',
+        'last_signal_signature', 'signal_signatures', 'max_signal_history', '_signature_order',
+        'portfolio_stats', 'trend_history', 'max_trend_history', 'persistence_manager'
+    )
+    
+    # ตาราง score สำหรับ bisect_right (threshold แบบ >= เรียงจากน้อยไปมาก)
+    # index = จำนวน threshold ที่ค่าผ่าน → (score, คำอธิบาย)
+    _BODY_SCORE_THRESHOLDS = (0.05, 0.15, 0.3, 0.5, 0.7)
+    _BODY_SCORES = (
+        (-0.05, "Doji penalty"), (0.03, "Very weak"), (0.08, "Weak"),
+        (0.15, "Medium"), (0.20, "Strong"), (0.25, "Very strong")
+    )
+    # (score, คำอธิบาย) ตามจำนวนแท่งสีเดียวกับ trend - จำนวนอื่น = _PATTERN_SCORE_WEAK
+    _PATTERN_SCORES = {3: (0.40, "Perfect 3/3"), 2: (0.25, "Good 2/3")}
+    _PATTERN_SCORE_WEAK = (0.05, "Weak 1/3")
+    _MOMENTUM_SCORE_THRESHOLDS = (2.5, 5.0, 10.0, 15.0)  # points - ปรับสำหรับ M5
+    _MOMENTUM_SCORES = (
+        (-0.02, "Too weak"), (0.05, "Weak"), (0.10, "Medium"),
+        (0.15, "Strong"), (0.20, "Very strong")
+    )
+    _VOLUME_SCORE_THRESHOLDS = (0.8, 1.3, 1.8, 2.5)
+    _VOLUME_SCORES = (
+        (-0.03, "Low"), (0.01, "Normal"), (0.03, "Moderate"),
+        (0.06, "High"), (0.10, "Explosion")
+    )
+    
+    # (time_multiplier, คำอธิบาย) ของ movement filter ตามชั่วโมง 0-23
+    _MOVEMENT_TIME_BY_HOUR = (
+        ((0.5, "Overnight (very quiet)"),)
+        + ((0.6, "Asian (quiet)"),) * 8
+        + ((0.8, "London open"),) * 2
+        + ((0.7, "Regular hours"),) * 6
+        + ((0.8, "NY open"),) * 2
+        + ((0.7, "Regular hours"),) * 3
+        + ((0.5, "Overnight (very quiet)"),) * 2
+    )
+    
+    # (activity_level, config key ของ multiplier, ค่า default, is_overlap) ของ session filter ตามชั่วโมง 0-23
+    _SESSION_ACTIVITY_BY_HOUR = (
+        (('low', None, 0.2, False),)
+        + (('low', 'low_activity_reduction', 0.3, False),) * 8
+        + (('high', 'high_activity_boost', 1.2, True),) * 2
+        + (('high', 'high_activity_boost', 1.2, False),) * 6
+        + (('high', 'high_activity_boost', 1.2, True),) * 2
+        + (('high', 'high_activity_boost', 1.2, False),) * 5
+    )
+    
     def __init__(self, candlestick_analyzer, config: Dict):
         """
         🔧 เริ่มต้น Smart Signal Generator
@@ -57,11 +115,13 @@ class SignalGenerator:
         # Signal rate limiting (อัพเดทแล้ว)
         trading_config = config.get("trading", {})
         self.cooldown_seconds = trading_config.get("signal_cooldown_seconds", 60)
+        self._cooldown_ns = int(self.cooldown_seconds * 1_000_000_000)
         self.max_signals_per_hour = trading_config.get("max_signals_per_hour", 80)
         self.high_frequency_mode = trading_config.get("high_frequency_mode", True)
         
         # Signal tracking (เดิม)
         self.last_signal_time = datetime.min
+        self._last_signal_ns = None  # time.monotonic_ns() ของ signal ล่าสุด สำหรับ cooldown
         self.signal_history = []
         self.total_signals_today = 0
         self.last_reset_date = datetime.now().date()
@@ -74,6 +134,7 @@ class SignalGenerator:
         self.last_signal_signature = None
         self.signal_signatures = set()
         self.max_signal_history = 100
+        self._signature_order = deque(maxlen=self.max_signal_history)  # ลำดับ signature สำหรับ evict ตัวเก่าสุด
         
         # 🆕 NEW: Portfolio tracking
         self.portfolio_stats = {
@@ -86,6 +147,8 @@ class SignalGenerator:
         self.trend_history = []
         self.max_trend_history = 10
         
+        self.persistence_manager = None
+        
         print(f"🎯 Smart Signal Generator initialized")
         print(f"   Mode: Smart Frequent Entry")
         print(f"   Cooldown: {self.cooldown_seconds}s")
@@ -104,43 +167,46 @@ class SignalGenerator:
         คงชื่อ method เดิมไว้ แต่เปลี่ยน logic เป็น Mini Trend
         """
         try:
-            if not candlestick_data:
-                return self._create_wait_signal("No data")
+            now = datetime.now()  # ใช้เวลาเดียวกันตลอดรอบ signal generation
+            
+            if candlestick_data is None:
+                return self._create_wait_signal("No data", now)
             
             # ตรวจสอบ rate limiting (เดิม)
-            if not self._check_rate_limits():
-                return self._create_wait_signal("Rate limit exceeded")
+            if not self._check_rate_limits(now):
+                return self._create_wait_signal("Rate limit exceeded", now)
             
             # ดึง timestamp และ signature check (เดิม)
             candle_timestamp = candlestick_data.get('candle_timestamp')
             if not candle_timestamp:
-                return self._create_wait_signal("No timestamp")
+                return self._create_wait_signal("No timestamp", now)
             
-            signature = f"SIGNAL_{candle_timestamp}"
+            # signature = candle timestamp (int) - ไม่ต้องสร้าง string ทุกรอบ
+            signature = int(candle_timestamp)
             if self._is_signal_sent_for_signature(signature):
                 return None
             
             # 🆕 NEW: ดึงข้อมูล candles หลายแท่งสำหรับ mini trend
             recent_candles = self._get_recent_candles_data(candlestick_data)
             if not recent_candles or len(recent_candles) < 3:
-                return self._create_wait_signal("Insufficient candle data")
+                return self._create_wait_signal("Insufficient candle data", now)
             
             # 🆕 NEW: อัพเดท portfolio stats
-            self._update_portfolio_stats()
+            self._update_portfolio_stats(now)
             
             # 🆕 NEW: Mini Trend Analysis
             trend_signal = self._analyze_mini_trend(recent_candles)
             if not trend_signal:
-                return self._create_wait_signal("No mini trend detected")
+                return self._create_wait_signal("No mini trend detected", now)
             
             # 🆕 NEW: Quality Filters
-            if not self._pass_quality_filters(recent_candles, trend_signal):
-                return self._create_wait_signal("Failed quality filters")
+            if not self._pass_quality_filters(recent_candles, trend_signal, now):
+                return self._create_wait_signal("Failed quality filters", now)
             
             # 🆕 NEW: Portfolio Balance Adjustment
             adjusted_signal = self._apply_portfolio_balance(trend_signal)
             if not adjusted_signal:
-                return self._create_wait_signal("Portfolio balance blocked")
+                return self._create_wait_signal("Portfolio balance blocked", now)
             
             # Lock signal signature
             self._mark_signal_sent_for_signature(signature)
@@ -150,7 +216,7 @@ class SignalGenerator:
                 'action': adjusted_signal['action'],
                 'strength': adjusted_signal['strength'],
                 'confidence': adjusted_signal['confidence'],
-                'timestamp': datetime.now(),
+                'timestamp': now,
                 'signal_id': f"{adjusted_signal['action']}_{candle_timestamp}",
                 'candle_timestamp': candle_timestamp,
                 'close': recent_candles[-1]['close'],
@@ -161,7 +227,7 @@ class SignalGenerator:
             }
             
             # บันทึก signal (เดิม)
-            self._record_signal(signal)
+            self._record_signal(signal, now)
             
             print(f"🎯 SMART SIGNAL: {signal['action']} (Strength: {signal['strength']:.2f})")
             print(f"   Mini trend: {adjusted_signal.get('trend_pattern', 'unknown')}")
@@ -194,15 +260,16 @@ class SignalGenerator:
                 print(f"❌ ไม่สามารถดึง rates data ได้")
                 return []
             
-            # แปลงเป็น format ที่ใช้งาน
+            # แปลงเป็น format ที่ใช้งาน - tolist() แปลงทั้งก้อนเป็น Python scalars ครั้งเดียว
+            has_volume = len(rates.dtype.names) > 5
             candles = []
-            for i, rate in enumerate(rates[-3:]):  # ใช้ 3 แท่งล่าสุด
+            for rate in rates[-3:].tolist():  # ใช้ 3 แท่งล่าสุด
                 candle = {
                     'open': float(rate[1]),    # rates[i][1] = open
                     'high': float(rate[2]),    # rates[i][2] = high  
                     'low': float(rate[3]),     # rates[i][3] = low
                     'close': float(rate[4]),   # rates[i][4] = close
-                    'volume': int(rate[5]) if len(rate) > 5 else 0,
+                    'volume': int(rate[5]) if has_volume else 0,
                     'timestamp': int(rate[0])
                 }
                 
@@ -214,7 +281,7 @@ class SignalGenerator:
                 
                 candles.append(candle)
             
-            print(f"🔍 Retrieved {len(candles)} candles for mini trend analysis")
+            logger.debug("🔍 Retrieved %d candles for mini trend analysis", len(candles))
             return candles
             
         except Exception as e:
@@ -301,7 +368,7 @@ class SignalGenerator:
         5. Market Context (5%) - เงื่อนไขโดยรวม
         """
         try:
-            print(f"\n🔍 ENHANCED CALCULATION START: {direction}")
+            logger.debug("🔍 ENHANCED CALCULATION START: %s", direction)
             
             if len(candles) < 3:
                 return 0.5
@@ -318,49 +385,24 @@ class SignalGenerator:
             # =============================================
             # 1. PATTERN CONSISTENCY ANALYSIS (40% weight)
             # =============================================
-            if same_color_count == 3:      # Perfect pattern
-                pattern_score = 0.40
-                pattern_desc = "Perfect 3/3"
-            elif same_color_count == 2:   # Good pattern
-                pattern_score = 0.25
-                pattern_desc = "Good 2/3"
-                # Bonus for consecutive candles
-                if candles[-2]['candle_color'] == candles[-1]['candle_color'] == target_color:
-                    pattern_score += 0.05
-                    pattern_desc += " +consecutive"
-            else:                         # Weak pattern
-                pattern_score = 0.05
-                pattern_desc = "Weak 1/3"
+            pattern_score, pattern_desc = self._PATTERN_SCORES.get(same_color_count, self._PATTERN_SCORE_WEAK)
+            # Bonus for consecutive candles (Good 2/3 เท่านั้น)
+            if same_color_count == 2 and candles[-2]['candle_color'] == candles[-1]['candle_color'] == target_color:
+                pattern_score += 0.05
+                pattern_desc += " +consecutive"
             
             strength += pattern_score
-            print(f"   🎨 Pattern: {pattern_desc} → +{pattern_score:.3f}")
+            logger.debug("   🎨 Pattern: %s → +%.3f", pattern_desc, pattern_score)
             
             # =============================================
             # 2. BODY STRENGTH ANALYSIS (25% weight)
             # =============================================
             body_ratios = [candle['body_ratio'] for candle in candles]
             avg_body_ratio = sum(body_ratios) / len(body_ratios)
-            current_body = candles[-1]['body_ratio']
+            current_body = body_ratios[-1]
             
             # Body quality scoring
-            if avg_body_ratio >= 0.7:      # Very strong bodies
-                body_score = 0.25
-                body_desc = "Very strong"
-            elif avg_body_ratio >= 0.5:   # Strong bodies
-                body_score = 0.20
-                body_desc = "Strong"
-            elif avg_body_ratio >= 0.3:   # Medium bodies
-                body_score = 0.15
-                body_desc = "Medium"
-            elif avg_body_ratio >= 0.15:  # Weak bodies
-                body_score = 0.08
-                body_desc = "Weak"
-            elif avg_body_ratio >= 0.05:  # Very weak
-                body_score = 0.03
-                body_desc = "Very weak"
-            else:                          # Doji-like
-                body_score = -0.05
-                body_desc = "Doji penalty"
+            body_score, body_desc = self._BODY_SCORES[bisect_right(self._BODY_SCORE_THRESHOLDS, avg_body_ratio)]
             
             # Current candle body bonus/penalty
             if current_body >= 0.8:
@@ -374,7 +416,7 @@ class SignalGenerator:
             
             total_body_score = body_score + current_bonus
             strength += total_body_score
-            print(f"   💪 Body: {body_desc} (avg={avg_body_ratio:.3f}, curr={current_body:.3f}) → +{total_body_score:.3f}")
+            logger.debug("   💪 Body: %s (avg=%.3f, curr=%.3f) → +%.3f", body_desc, avg_body_ratio, current_body, total_body_score)
             
             # =============================================
             # 3. MOMENTUM ANALYSIS (20% weight)
@@ -382,21 +424,9 @@ class SignalGenerator:
             price_momentum = abs(candles[-1]['close'] - candles[0]['close'])
             
             # Momentum scoring - ปรับสำหรับ M5
-            if price_momentum >= 15.0:     # Very strong movement (5x)
-                momentum_score = 0.20
-                momentum_desc = "Very strong"
-            elif price_momentum >= 10.0:  # Strong movement (5x)
-                momentum_score = 0.15
-                momentum_desc = "Strong"
-            elif price_momentum >= 5.0:   # Medium movement (5x)
-                momentum_score = 0.10
-                momentum_desc = "Medium"
-            elif price_momentum >= 2.5:   # Weak movement (5x)
-                momentum_score = 0.05
-                momentum_desc = "Weak"
-            else:                          # Very weak
-                momentum_score = -0.02
-                momentum_desc = "Too weak"
+            momentum_score, momentum_desc = self._MOMENTUM_SCORES[
+                bisect_right(self._MOMENTUM_SCORE_THRESHOLDS, price_momentum)
+            ]
 
             # Acceleration check
             if len(candles) >= 3:
@@ -419,7 +449,7 @@ class SignalGenerator:
             
             total_momentum = momentum_score + accel_bonus
             strength += total_momentum
-            print(f"   🚀 Momentum: {momentum_desc} ({price_momentum:.2f}pts) → +{total_momentum:.3f}")
+            logger.debug("   🚀 Momentum: %s (%.2fpts) → +%.3f", momentum_desc, price_momentum, total_momentum)
             
             # =============================================
             # 4. VOLUME CONFIRMATION (10% weight)
@@ -428,32 +458,22 @@ class SignalGenerator:
             volume_score = 0.0
             volume_desc = "No data"
             
-            if 'volume' in current_candle and current_candle['volume'] > 0:
-                prev_volumes = [c.get('volume', 1) for c in candles[:-1] if c.get('volume', 0) > 0]
+            # candles จาก _get_recent_candles_data มี 'volume' ทุกแท่ง
+            current_volume = current_candle['volume']
+            if current_volume > 0:
+                prev_volumes = [v for v in (c['volume'] for c in candles[:-1]) if v > 0]
                 
                 if prev_volumes:
                     avg_prev_volume = sum(prev_volumes) / len(prev_volumes)
-                    current_volume = current_candle['volume']
                     volume_ratio = current_volume / max(avg_prev_volume, 1)
                     
-                    if volume_ratio >= 2.5:     # Volume explosion
-                        volume_score = 0.10
-                        volume_desc = f"Explosion ({volume_ratio:.1f}x)"
-                    elif volume_ratio >= 1.8:  # High volume
-                        volume_score = 0.06
-                        volume_desc = f"High ({volume_ratio:.1f}x)"
-                    elif volume_ratio >= 1.3:  # Moderate increase
-                        volume_score = 0.03
-                        volume_desc = f"Moderate ({volume_ratio:.1f}x)"
-                    elif volume_ratio >= 0.8:  # Normal
-                        volume_score = 0.01
-                        volume_desc = f"Normal ({volume_ratio:.1f}x)"
-                    else:                       # Low volume
-                        volume_score = -0.03
-                        volume_desc = f"Low ({volume_ratio:.1f}x)"
+                    volume_score, volume_level = self._VOLUME_SCORES[
+                        bisect_right(self._VOLUME_SCORE_THRESHOLDS, volume_ratio)
+                    ]
+                    volume_desc = f"{volume_level} ({volume_ratio:.1f}x)"
             
             strength += volume_score
-            print(f"   📊 Volume: {volume_desc} → +{volume_score:.3f}")
+            logger.debug("   📊 Volume: %s → +%.3f", volume_desc, volume_score)
             
             # =============================================
             # 5. MARKET CONTEXT (5% weight)
@@ -469,8 +489,7 @@ class SignalGenerator:
                 context_score -= 0.03
                 context_penalties.append("mixed_signals")
             
-            # Weak current candle penalty
-            current_body = candles[-1]['body_ratio']
+            # Weak current candle penalty (current_body จากข้อ 2)
             if current_body < 0.03:
                 context_score -= 0.05
                 context_penalties.append("weak_current")
@@ -487,17 +506,18 @@ class SignalGenerator:
             
             strength += context_score
             context_desc = ", ".join(context_penalties) if context_penalties else "neutral"
-            print(f"   🌐 Context: {context_desc} → +{context_score:.3f}")
+            logger.debug("   🌐 Context: %s → +%.3f", context_desc, context_score)
             
             # =============================================
             # 6. FINAL SCORE CALCULATION
             # =============================================
             final_strength = round(min(max(strength, 0.05), 0.95), 3)
             
-            print(f"   📊 CALCULATION SUMMARY:")
-            print(f"      Base(0.1) + Pattern({pattern_score:.3f}) + Body({total_body_score:.3f}) + Momentum({total_momentum:.3f}) + Volume({volume_score:.3f}) + Context({context_score:.3f})")
-            print(f"   🎯 FINAL {direction.upper()} STRENGTH: {final_strength:.3f}")
-            print(f"   📈 Expected lot range: {self._predict_lot_size(final_strength)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("   📊 Base(0.1) + Pattern(%.3f) + Body(%.3f) + Momentum(%.3f) + Volume(%.3f) + Context(%.3f)",
+                             pattern_score, total_body_score, total_momentum, volume_score, context_score)
+                logger.debug("   🎯 FINAL %s STRENGTH: %.3f (expected lot range: %s)",
+                             direction.upper(), final_strength, self._predict_lot_size(final_strength))
             
             return final_strength
             
@@ -523,8 +543,11 @@ class SignalGenerator:
     # 🆕 NEW: PORTFOLIO BALANCE METHODS
     # ==========================================
     
-    def _update_portfolio_stats(self):
+    def _update_portfolio_stats(self, now: Optional[datetime] = None):
         """📊 อัพเดทสถิติ portfolio - FIXED"""
+        if now is None:
+            now = datetime.now()
+        
         try:
             # ✅ แก้ไข: ใช้ mt5_connector ผ่าน candlestick_analyzer
             if not self.candlestick_analyzer or not self.candlestick_analyzer.mt5_connector.is_connected:
@@ -533,7 +556,7 @@ class SignalGenerator:
             # ดึง positions
             raw_positions = mt5.positions_get()
             if not raw_positions:
-                self.portfolio_stats = {'buy_positions': 0, 'sell_positions': 0, 'last_update': datetime.now()}
+                self.portfolio_stats = {'buy_positions': 0, 'sell_positions': 0, 'last_update': now}
                 return
             
             # ✅ แก้การนับ BUY/SELL - ใช้ raw MT5 data
@@ -552,14 +575,14 @@ class SignalGenerator:
                 'total_positions': len(raw_positions),
                 'buy_ratio': buy_count / max(len(raw_positions), 1),
                 'sell_ratio': sell_count / max(len(raw_positions), 1),
-                'last_update': datetime.now()
+                'last_update': now
             }
             
             # print(f"📊 Portfolio: BUY {buy_count}, SELL {sell_count}")
             
         except Exception as e:
             print(f"❌ Portfolio stats update error: {e}")
-            self.portfolio_stats = {'buy_positions': 0, 'sell_positions': 0, 'last_update': datetime.now()}
+            self.portfolio_stats = {'buy_positions': 0, 'sell_positions': 0, 'last_update': now}
 
     def _apply_portfolio_balance(self, trend_signal: Dict) -> Optional[Dict]:
         """
@@ -619,22 +642,26 @@ class SignalGenerator:
             print(f"❌ Portfolio balance error: {e}")
             return trend_signal
     
-    def _pass_quality_filters(self, candles: List[Dict], signal: Dict) -> bool:
+    def _pass_quality_filters(self, candles: List[Dict], signal: Dict,
+                              now: Optional[datetime] = None) -> bool:
         """
         🔍 ตรวจสอบ Quality Filters เพื่อป้องกันการเข้าไม้มั่วซั่ว
+        
+        Args:
+            now: เวลาของรอบ signal (None = datetime.now())
         """
         try:
             # 1. Price Movement Filter
             movement_filter = self.filter_config.get("price_movement_filter", {})
             if movement_filter.get('enabled', True):
-                if not self._check_price_movement_filter(candles):
+                if not self._check_price_movement_filter(candles, now):
                     print(f"🚫 Failed price movement filter")
                     return False
             
             # 2. Session Activity Filter  
             session_filter = self.filter_config.get("session_activity_filter", {})
             if session_filter.get('enabled', True):
-                if not self._check_session_filter(signal):
+                if not self._check_session_filter(signal, now):
                     print(f"🚫 Failed session activity filter")
                     return False
             
@@ -651,7 +678,7 @@ class SignalGenerator:
             print(f"❌ Quality filter error: {e}")
             return False
     
-    def _check_price_movement_filter(self, candles: List[Dict]) -> bool:
+    def _check_price_movement_filter(self, candles: List[Dict], now: Optional[datetime] = None) -> bool:
         """
         🔍 ตรวจสอบการเคลื่อนไหวของราคา - FLEXIBLE VERSION
         
@@ -674,35 +701,15 @@ class SignalGenerator:
             previous_close = candles[-2]['close']
             price_change = abs(current_close - previous_close)
             
-            print(f"📊 Movement Analysis:")
-            print(f"   Current movement: {price_change:.3f} points")
-            print(f"   Base threshold: {base_min_movement:.3f} points")
+            logger.debug("📊 Movement Analysis: current %.3f points, base threshold %.3f points", price_change, base_min_movement)
             
             # ==========================================
             # 🎯 SMART DYNAMIC THRESHOLD CALCULATION
             # ==========================================
             
             # 1️⃣ Time-based adjustments
-            from datetime import datetime
-            current_hour = datetime.now().hour
-            time_multiplier = 1.0
-            time_desc = ""
-            
-            if 1 <= current_hour < 9:    # Asian session - ช้า
-                time_multiplier = 0.6  # ผ่อนปรน 40%
-                time_desc = "Asian (quiet)"
-            elif 22 <= current_hour or current_hour < 2:  # Overnight - เงียบ
-                time_multiplier = 0.5  # ผ่อนปรน 50%
-                time_desc = "Overnight (very quiet)"
-            elif 9 <= current_hour < 11:   # London open - active
-                time_multiplier = 0.8  # ผ่อนปรนเล็กน้อย
-                time_desc = "London open"
-            elif 17 <= current_hour < 19:  # NY open - active
-                time_multiplier = 0.8  # ผ่อนปรนเล็กน้อย
-                time_desc = "NY open"
-            else:
-                time_multiplier = 0.7  # ผ่อนปรนปกติ
-                time_desc = "Regular hours"
+            current_hour = (now if now is not None else datetime.now()).hour
+            time_multiplier, time_desc = self._MOVEMENT_TIME_BY_HOUR[current_hour]
             
             # 2️⃣ Market volatility adjustment
             volatility_multiplier = 1.0
@@ -723,7 +730,7 @@ class SignalGenerator:
                     else:
                         volatility_multiplier = 0.7  # ผ่อนปรนปกติ
                     
-                    print(f"   Recent avg movement: {avg_movement:.3f} → vol_mult: {volatility_multiplier:.1f}")
+                    logger.debug("   Recent avg movement: %.3f → vol_mult: %.1f", avg_movement, volatility_multiplier)
             
             # 3️⃣ Trend continuation bonus
             trend_bonus = 1.0
@@ -737,7 +744,7 @@ class SignalGenerator:
                 if ((prev1_close > prev2_close and curr_close > prev1_close) or 
                     (prev1_close < prev2_close and curr_close < prev1_close)):
                     trend_bonus = 0.5  # ผ่อนปรน 50% สำหรับ trend continuation
-                    print(f"   🔄 Trend continuation detected → bonus: {trend_bonus:.1f}")
+                    logger.debug("   🔄 Trend continuation detected → bonus: %.1f", trend_bonus)
             
             # ==========================================
             # 🧮 CALCULATE FINAL DYNAMIC THRESHOLD
@@ -746,12 +753,8 @@ class SignalGenerator:
             final_threshold = base_min_movement * time_multiplier * volatility_multiplier * trend_bonus
             final_threshold = max(0.02, final_threshold)  # อย่างต่ำ 0.02 points (2 pips)
             
-            print(f"   📐 Dynamic calculation:")
-            print(f"      Base: {base_min_movement:.3f}")
-            print(f"      × Time ({time_desc}): {time_multiplier:.1f}")
-            print(f"      × Volatility: {volatility_multiplier:.1f}")
-            print(f"      × Trend bonus: {trend_bonus:.1f}")
-            print(f"      = Final threshold: {final_threshold:.3f} points")
+            logger.debug("   📐 Dynamic threshold: base %.3f × time (%s) %.1f × volatility %.1f × trend %.1f = %.3f points",
+                         base_min_movement, time_desc, time_multiplier, volatility_multiplier, trend_bonus, final_threshold)
             
             # ==========================================
             # 🎯 SPECIAL EXCEPTION RULES
@@ -803,54 +806,44 @@ class SignalGenerator:
             
             # ใช้ special exception
             if special_pass:
-                print(f"✅ Special exception: {special_reason}")
+                logger.debug("✅ Special exception: %s", special_reason)
                 return True
             
             # ตรวจสอบ threshold ปกติ
             if price_change >= final_threshold:
-                print(f"✅ Movement OK: {price_change:.3f} >= {final_threshold:.3f}")
+                logger.debug("✅ Movement OK: %.3f >= %.3f", price_change, final_threshold)
                 return True
             else:
-                print(f"⚠️ Movement low: {price_change:.3f} < {final_threshold:.3f}")
-                print(f"   แต่เพิ่ม flexibility ให้ระบบ...")
+                logger.debug("⚠️ Movement low: %.3f < %.3f - เพิ่ม flexibility ให้ระบบ", price_change, final_threshold)
                 
                 # 🎯 LAST RESORT: ให้ pass บางครั้ง (30% chance)
                 import random
                 if random.random() < 0.3:
-                    print(f"🎲 Random flexibility pass (30% chance)")
+                    logger.debug("🎲 Random flexibility pass (30% chance)")
                     return True
                 else:
-                    print(f"🚫 Movement filter blocked")
+                    logger.debug("🚫 Movement filter blocked")
                     return False
                 
         except Exception as e:
             print(f"❌ Movement filter error: {e}")
             return True  # Error = อนุญาต
         
-    def _check_session_filter(self, signal: Dict) -> bool:
+    def _check_session_filter(self, signal: Dict, now: Optional[datetime] = None) -> bool:
         """🕐 ตรวจสอบ session activity"""
         try:
             session_config = self.filter_config.get("session_activity_filter", {})
             
             # ตรวจจับ session ปัจจุบัน
-            current_hour = datetime.now().hour
+            current_hour = (now if now is not None else datetime.now()).hour
             
             # กำหนด session activity
-            if 1 <= current_hour < 9:    # Asian
-                activity_level = 'low'
-                frequency_multiplier = session_config.get('low_activity_reduction', 0.3)
-            elif 9 <= current_hour < 17:  # London  
-                activity_level = 'high'
-                frequency_multiplier = session_config.get('high_activity_boost', 1.2)
-            elif 17 <= current_hour <= 23: # NY
-                activity_level = 'high' 
-                frequency_multiplier = session_config.get('high_activity_boost', 1.2)
-            else:  # Quiet
-                activity_level = 'low'
-                frequency_multiplier = 0.2
+            activity_level, multiplier_key, frequency_multiplier, is_overlap = self._SESSION_ACTIVITY_BY_HOUR[current_hour]
+            if multiplier_key:
+                frequency_multiplier = session_config.get(multiplier_key, frequency_multiplier)
             
             # Overlap bonus
-            if 9 <= current_hour < 11 or 17 <= current_hour < 19:
+            if is_overlap:
                 frequency_multiplier *= session_config.get('overlap_boost', 1.5)
                 activity_level = 'overlap'
             
@@ -860,7 +853,7 @@ class SignalGenerator:
                 print(f"🕐 Session gate: {activity_level} activity blocked signal")
                 return False
             
-            print(f"✅ Session gate passed: {activity_level} activity")
+            logger.debug("✅ Session gate passed: %s activity", activity_level)
             signal['session_activity'] = activity_level
             signal['frequency_multiplier'] = frequency_multiplier
             
@@ -888,14 +881,14 @@ class SignalGenerator:
             high_vol_threshold = volatility_config.get("high_volatility_threshold", 3.0)
             
             if volatility_ratio < low_vol_threshold:
-                print(f"📈 Low volatility: {volatility_ratio:.2f} - may reduce signals")
+                logger.debug("📈 Low volatility: %.2f - may reduce signals", volatility_ratio)
                 # ไม่ block แต่อาจลด strength
                 
             elif volatility_ratio > high_vol_threshold:
-                print(f"📈 High volatility: {volatility_ratio:.2f} - caution mode") 
+                logger.debug("📈 High volatility: %.2f - caution mode", volatility_ratio)
                 # ไม่ block แต่ระวัง
             
-            print(f"✅ Volatility check passed: {volatility_ratio:.2f}")
+            logger.debug("✅ Volatility check passed: %.2f", volatility_ratio)
             return True
             
         except Exception as e:
@@ -935,7 +928,7 @@ class SignalGenerator:
                 strength_multiplier = min_mult + (signal_strength ** sensitivity) * (max_mult - min_mult)
                 final_lot *= strength_multiplier
                 
-                print(f"📊 Signal strength: {signal_strength:.2f} → x{strength_multiplier:.2f}")
+                logger.debug("📊 Signal strength: %.2f → x%.2f", signal_strength, strength_multiplier)
             
             # 2. Trend Strength Factor
             trend_config = lot_config.get("trend_strength_factor", {})
@@ -945,10 +938,10 @@ class SignalGenerator:
                 
                 if trend_strength >= threshold:
                     trend_multiplier = trend_config.get('strong_trend_multiplier', 1.5)
-                    print(f"💪 Strong trend: x{trend_multiplier:.2f}")
+                    logger.debug("💪 Strong trend: x%.2f", trend_multiplier)
                 else:
                     trend_multiplier = trend_config.get('weak_trend_multiplier', 0.7)
-                    print(f"📉 Weak trend: x{trend_multiplier:.2f}")
+                    logger.debug("📉 Weak trend: x%.2f", trend_multiplier)
                 
                 final_lot *= trend_multiplier
             
@@ -960,11 +953,11 @@ class SignalGenerator:
                 if balance_factor > 1.0:  # ต้องการเพิ่มฝั่งนี้
                     boost = balance_config.get('imbalance_boost', 1.3)
                     balance_multiplier = min(balance_factor, boost)
-                    print(f"⚖️ Balance boost: x{balance_multiplier:.2f}")
+                    logger.debug("⚖️ Balance boost: x%.2f", balance_multiplier)
                 elif balance_factor < 1.0:  # ฝั่งนี้เยอะเกิน
                     reduction = balance_config.get('oversupply_reduction', 0.6)
                     balance_multiplier = max(balance_factor, reduction)
-                    print(f"⚖️ Balance reduction: x{balance_multiplier:.2f}")
+                    logger.debug("⚖️ Balance reduction: x%.2f", balance_multiplier)
                 else:
                     balance_multiplier = 1.0
                 
@@ -976,13 +969,13 @@ class SignalGenerator:
                 # ใช้ข้อมูลจาก signal ถ้ามี หรือคำนวณใหม่
                 movement_factor = self._calculate_movement_factor(signal_data)
                 final_lot *= movement_factor
-                print(f"📏 Movement factor: x{movement_factor:.2f}")
+                logger.debug("📏 Movement factor: x%.2f", movement_factor)
             
             # ปรับเข้า range ที่กำหนด
             final_lot = max(min_lot, min(final_lot, max_lot))
             final_lot = round(final_lot, 3)  # ปัดเป็น 3 ตำแหน่ง
             
-            print(f"💰 Dynamic lot calculated: {final_lot:.3f}")
+            logger.debug("💰 Dynamic lot calculated: %.3f", final_lot)
             return final_lot
             
         except Exception as e:
@@ -1017,18 +1010,16 @@ class SignalGenerator:
     # 🔧 UTILITY METHODS (คงเดิมส่วนใหญ่)
     # ==========================================
     
-    def _check_rate_limits(self) -> bool:
+    def _check_rate_limits(self, now: Optional[datetime] = None) -> bool:
         """⏰ ตรวจสอบ rate limiting (เดิม)"""
         try:
-            now = datetime.now()
-            
-            # ตรวจสอบ cooldown
-            time_since_last = (now - self.last_signal_time).total_seconds()
-            if time_since_last < self.cooldown_seconds:
+            # ตรวจสอบ cooldown - เทียบ int ns ไม่ต้องสร้าง datetime/timedelta
+            if (self._last_signal_ns is not None
+                    and time.monotonic_ns() - self._last_signal_ns < self._cooldown_ns):
                 return False
             
             # ตรวจสอบสัญญาณต่อชั่วโมง  
-            hour_ago = now - timedelta(hours=1)
+            hour_ago = (now if now is not None else datetime.now()) - timedelta(hours=1)
             recent_signals = [s for s in self.signal_history if s['timestamp'] > hour_ago]
             
             if len(recent_signals) >= self.max_signals_per_hour:
@@ -1040,66 +1031,62 @@ class SignalGenerator:
             print(f"❌ Rate limit check error: {e}")
             return False
     
-    def _create_wait_signal(self, reason: str) -> Dict:
+    def _create_wait_signal(self, reason: str, now: Optional[datetime] = None) -> Dict:
         """สร้าง WAIT signal (เดิม)"""
+        if now is None:
+            now = datetime.now()
         return {
             'action': 'WAIT',
             'strength': 0.0,
             'confidence': 0.0,
-            'timestamp': datetime.now(),
+            'timestamp': now,
             'reason': reason,
-            'signal_id': f"WAIT_{datetime.now().strftime('%H%M%S')}"
+            'signal_id': f"WAIT_{now.hour:02d}{now.minute:02d}{now.second:02d}"
         }
     
-    def _is_signal_sent_for_signature(self, signature: str) -> bool:
+    def _is_signal_sent_for_signature(self, signature: int) -> bool:
         """🔒 เช็คว่าส่ง signal แล้วหรือยัง (เดิม)"""
         try:
-            if not hasattr(self, 'signal_signatures'):
-                self.signal_signatures = set()
-            
             return signature in self.signal_signatures
             
         except Exception as e:
             return False
     
-    def _mark_signal_sent_for_signature(self, signature: str):
+    def _mark_signal_sent_for_signature(self, signature: int):
         """🔒 บันทึกว่าส่ง signal แล้ว (เดิม)"""
         try:
-            if not hasattr(self, 'signal_signatures'):
-                self.signal_signatures = set()
+            if signature in self.signal_signatures:
+                return
             
-            self.signal_signatures.add(signature)
+            # เก็บแค่ max_signal_history signatures ล่าสุด - evict ตัวเก่าสุดทีละตัว
+            if len(self._signature_order) == self._signature_order.maxlen:
+                self.signal_signatures.discard(self._signature_order[0])
             
-            # เก็บแค่ 100 signatures ล่าสุด
-            if len(self.signal_signatures) > 100:
-                signatures_list = list(self.signal_signatures)
-                self.signal_signatures = set(signatures_list[-50:])
+            self._signature_order.append(signature)
+            self.signal_signatures.add(signature)
             
         except Exception as e:
             print(f"❌ Mark signature error: {e}")
     
-    def _record_signal(self, signal_data: Dict):
+    def _record_signal(self, signal_data: Dict, now: Optional[datetime] = None):
         """📝 บันทึก Signal History (เดิม)"""
         try:
-            if not hasattr(self, 'signals_generated'):
-                self.signals_generated = {'BUY': 0, 'SELL': 0, 'WAIT': 0}
-            if not hasattr(self, 'signal_history'):
-                self.signal_history = []
-            if not hasattr(self, 'last_signal_time'):
-                self.last_signal_time = datetime.min
-                
+            if now is None:
+                now = datetime.now()
+            
             action = signal_data.get('action')
             if action in ['BUY', 'SELL']:
                 self.signals_generated[action] += 1
                 self.signal_history.append({
                     'action': action,
                     'strength': signal_data.get('strength', 0),
-                    'timestamp': datetime.now(),
+                    'timestamp': now,
                     'signal_id': signal_data.get('signal_id')
                 })
-                self.last_signal_time = datetime.now()
+                self.last_signal_time = now
+                self._last_signal_ns = time.monotonic_ns()
                 
-            print(f"📝 Signal recorded: {action}")
+            logger.debug("📝 Signal recorded: %s", action)
             
         except Exception as e:
             print(f"❌ Record signal error: {e}")
@@ -1111,10 +1098,10 @@ class SignalGenerator:
     def clear_signal_locks(self):
         """🗑️ ล้างการล็อก signal ทั้งหมด (เดิม)"""
         try:
-            if hasattr(self, 'signal_signatures'):
-                old_count = len(self.signal_signatures)
-                self.signal_signatures.clear()
-                print(f"🗑️ Cleared {old_count} signal signature locks")
+            old_count = len(self.signal_signatures)
+            self.signal_signatures.clear()
+            self._signature_order.clear()
+            print(f"🗑️ Cleared {old_count} signal signature locks")
             
             return True
             
@@ -1125,13 +1112,10 @@ class SignalGenerator:
     def get_signal_lock_info(self) -> Dict:
         """📊 ข้อมูลการล็อก signal (เดิม)"""
         try:
-            if not hasattr(self, 'signal_signatures'):
-                self.signal_signatures = set()
-            
             return {
                 'total_locked_signatures': len(self.signal_signatures),
-                'recent_signatures': list(self.signal_signatures)[-5:] if self.signal_signatures else [],
-                'max_signature_history': 100,
+                'recent_signatures': [f"SIGNAL_{ts}" for ts in list(self._signature_order)[-5:]],
+                'max_signature_history': self.max_signal_history,
                 'lock_method': 'candle_timestamp_based'
             }
             
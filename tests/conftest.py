@@ -0,0 +1,6 @@
+"""🧪 ให้ tests import โมดูลที่ root ของ repo ได้โดยตรง"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,61 @@
+"""
+🧪 CandleAnalysis - copy / deepcopy / pickle round-trip
+"""
+
+import copy
+import pickle
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("MetaTrader5")
+
+from candlestick_analyzer import CandleAnalysis
+
+
+def _build_frozen() -> CandleAnalysis:
+    analysis = CandleAnalysis()
+    analysis._set_fields({
+        'open': 2000.0,
+        'close': 2001.5,
+        'candle_color': 'green',
+        'session_info': {'trading_session': 'london', 'current_hour': 10},
+        'analysis_timestamp': datetime(2024, 1, 2, 10, 0, 0)
+    })
+    analysis._freeze()
+    return analysis
+
+
+@pytest.mark.parametrize("clone", [
+    copy.copy,
+    copy.deepcopy,
+    lambda a: pickle.loads(pickle.dumps(a)),
+], ids=["copy", "deepcopy", "pickle"])
+def test_round_trip_keeps_fields_and_stays_read_only(clone):
+    original = _build_frozen()
+
+    restored = clone(original)
+
+    assert isinstance(restored, CandleAnalysis)
+    assert restored.to_dict() == original.to_dict()
+    assert 'volume' not in restored
+    with pytest.raises(AttributeError):
+        restored.close = 0.0
+
+
+def test_deepcopy_does_not_share_nested_values():
+    original = _build_frozen()
+
+    restored = copy.deepcopy(original)
+
+    assert restored['session_info'] is not original['session_info']
+
+
+def test_unfrozen_copy_stays_writable():
+    analysis = CandleAnalysis()
+    analysis.open = 1.0
+
+    restored = copy.copy(analysis)
+    restored.close = 2.0
+
+    assert restored.to_dict() == {'open': 1.0, 'close': 2.0}